@@ -0,0 +1,108 @@
+"""
+Price extraction micro-benchmark on saved result pages
+Compares the old body-text path (uncompiled regex, chained str.replace per match) with price_extraction,
+and the payload each one pulls over the WebDriver wire
+
+Usage: python benchmarks/bench_price_extraction.py [fixture_dir] [iterations] [--browser]
+fixture_dir defaults to fixtures/html; debug_page_*.html dumps can be dropped in there too.
+--browser also times both paths in headless Chrome against the same pages loaded from file://
+"""
+
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from price_extraction import PRICE_PATTERN, PRICE_NODES_SCRIPT, html_text, prices_from_text, extract_prices
+
+
+def legacy_extract_price(price_text):
+    """extract_price as it was before price_extraction"""
+    try:
+        price_clean = price_text.replace('TL', '').replace('₺', '').replace('.', '').replace(',', '.').strip()
+        match = re.search(r'[\d.]+', price_clean)
+        if match:
+            return float(match.group())
+        return None
+    except:
+        return None
+
+
+def legacy_prices_from_text(body_text, date):
+    """extract_prices_from_page as it was, minus the WebDriver call"""
+    prices = []
+    price_pattern = r'(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)\s*(?:TL|₺)'
+    matches = re.findall(price_pattern, body_text)
+    for match in matches:
+        price = legacy_extract_price(match + " TL")
+        if price and price > 100 and price < 50000:
+            prices.append({'price': price, 'text': f"{match} TL", 'date': date})
+    unique_prices = {}
+    for p in prices:
+        if p['price'] not in unique_prices:
+            unique_prices[p['price']] = p
+    return list(unique_prices.values())
+
+
+def bench(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations
+
+
+def bench_browser(paths, iterations):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.common.by import By
+
+    options = Options()
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    try:
+        driver = webdriver.Chrome(options=options)
+    except Exception as e:
+        print(f"⚠️  Skipping browser benchmark, Chrome did not start: {str(e).splitlines()[0]}")
+        return
+    try:
+        for path in paths:
+            driver.get('file://' + os.path.abspath(path))
+            old = bench(lambda: legacy_prices_from_text(driver.find_element(By.TAG_NAME, "body").text, ''), iterations)
+            new = bench(lambda: extract_prices(driver, ''), iterations)
+            print(f"   🌐 {os.path.basename(path)}: body.text {old * 1000:.1f}ms, "
+                  f"execute_script {new * 1000:.1f}ms ({old / new:.1f}x)")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    fixture_dir = args[0] if args else os.path.join(ROOT, 'fixtures', 'html')
+    iterations = int(args[1]) if len(args) > 1 else 500
+    paths = sorted(glob.glob(os.path.join(fixture_dir, '*.html')))
+    if not paths:
+        sys.exit(f"No .html fixtures in {fixture_dir}")
+
+    print(f"📄 {len(paths)} pages, {iterations} iterations each")
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = html_text(f.read())
+        old_prices = legacy_prices_from_text(text, 'd')
+        new_prices = prices_from_text(text, 'd')
+        assert old_prices == new_prices, f"{path}: new parser disagrees with the old one"
+
+        old = bench(lambda: legacy_prices_from_text(text, 'd'), iterations)
+        new = bench(lambda: prices_from_text(text, 'd'), iterations)
+        payload = len(json.dumps(PRICE_PATTERN.findall(text), ensure_ascii=False).encode('utf-8'))
+        print(f"   {os.path.basename(path)}: {len(new_prices)} prices | parse {old * 1e6:.0f}µs → {new * 1e6:.0f}µs "
+              f"({old / new:.1f}x) | wire {len(text.encode('utf-8')):,} → {payload:,} bytes")
+
+    if '--browser' in sys.argv:
+        bench_browser(paths, max(1, iterations // 50))
+    else:
+        print(f"   (script sent to the browser: {len(PRICE_NODES_SCRIPT)} bytes; run with --browser to time it in Chrome)")
@@ -0,0 +1,242 @@
+"""
+Offline benchmark suite on recorded fixtures
+Measures parse throughput, monitoring cycle latency (SerpApi, HTTP fast path) and history write cost without touching
+turkishairlines.com or serpapi.com, so regressions show up as numbers
+
+Usage: python benchmarks/bench_replay.py [--save results.json] [--compare baseline.json] [--browser]
+--compare exits with status 1 when a measurement is more than 20% (and 0.1ms) slower than the baseline
+--browser also replays fixtures/html through headless Chrome with the Selenium monitor, for comparison with the fast path
+"""
+
+import contextlib
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from replay_server import start_replay_server
+from price_extraction import prices_from_html
+
+SERPAPI_FIXTURES = os.path.join(ROOT, 'fixtures', 'serpapi')
+PAGE_FIXTURES = os.path.join(ROOT, 'fixtures', 'html')
+TOLERANCE = 0.2
+# Differences below this many seconds are timer noise, whatever the ratio
+NOISE_FLOOR = 0.0001
+
+
+def timed(func, repeat):
+    """Best-of-three average seconds per call"""
+    best = None
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def travel_dates(count, fmt='%Y-%m-%d'):
+    start = datetime.now() + timedelta(days=20)
+    return [(start + timedelta(days=i)).strftime(fmt) for i in range(count)]
+
+
+def quiet(func, *args):
+    """Run a monitor call with its progress output swallowed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def serpapi_monitor(config):
+    from flight_monitor_serpapi import FlightPriceMonitor
+    with open('config.json', 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return quiet(FlightPriceMonitor)
+
+
+def bench_parsing(results):
+    monitor = serpapi_monitor({'serpapi_key': 'replay', 'serpapi_cache': False})
+    for path in sorted(glob.glob(os.path.join(SERPAPI_FIXTURES, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        seconds = timed(lambda: monitor.parse_serpapi_flights(data), 2000)
+        results[f"parse_serpapi/{os.path.basename(path)}"] = seconds
+    for path in sorted(glob.glob(os.path.join(PAGE_FIXTURES, '*.html'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            page = f.read()
+        seconds = timed(lambda: prices_from_html(page, '04.02.2026'), 50)
+        results[f"parse_html/{os.path.basename(path)}"] = seconds
+
+
+def bench_cycle(results, base_url, dates, concurrency):
+    monitor = serpapi_monitor({
+        'serpapi_key': 'replay',
+        'serpapi_url': f"{base_url}/search.json",
+        'serpapi_cache': False,
+        'serpapi_concurrency': concurrency,
+        'serpapi_rate_per_second': 1000,
+        'price_threshold': 0,
+        'history_backend': 'sqlite',
+        'dates': travel_dates(dates)
+    })
+    # The sequential path pauses 3s between dates to be polite to SerpApi; that is not what we measure
+    sleep = time.sleep
+    time.sleep = lambda seconds: None
+    try:
+        seconds = timed(lambda: quiet(monitor.check_and_notify), 3)
+    finally:
+        time.sleep = sleep
+    results[f"cycle_serpapi/{dates}_dates_x{concurrency}"] = seconds
+
+
+def bench_history_writes(results, history_size, dates=8):
+    from flight_monitor_serpapi import FlightPriceMonitor
+    flights = [{'price': 1849 + i, 'airline': 'Turkish Airlines', 'departure_time': '07:10',
+                'arrival_time': '09:25', 'duration': 135, 'text': f"{1849 + i} TL"} for i in range(3)]
+    for backend in ('json', 'sqlite', 'jsonl'):
+        for name in glob.glob('price_history*'):
+            os.remove(name)
+        monitor = serpapi_monitor({'serpapi_key': 'replay', 'serpapi_cache': False, 'history_backend': backend})
+        old = {
+            f"2026-03-01_{i:08d}": {'date': '2026-03-01', 'timestamp': datetime.now().isoformat(),
+                                    'min_price': 1849, 'flights': flights}
+            for i in range(history_size)
+        }
+        if monitor.history_store is not None:
+            monitor.history_store.append_many('DIY-IST', old)
+        else:
+            monitor.price_history.update(old)
+
+        counter = {'cycle': 0}
+
+        def save_cycle():
+            counter['cycle'] += 1
+            for date in travel_dates(dates):
+                monitor.price_history[f"{date}_{counter['cycle']:08d}"] = {
+                    'date': date, 'timestamp': datetime.now().isoformat(), 'min_price': 1849, 'flights': flights
+                }
+            monitor.save_price_history()
+
+        results[f"history_save/{backend}/{history_size}_entries"] = timed(save_cycle, 5)
+        if monitor.history_store is not None:
+            monitor.history_store.close()
+
+
+def state_pages(page_dir, dates, flights=40):
+    """Copies of the default page carrying per-date JSON state, which is all the fast path reads"""
+    with open(os.path.join(PAGE_FIXTURES, 'default.html'), 'r', encoding='utf-8') as f:
+        page = f.read()
+    for date in dates:
+        day = datetime.strptime(date, '%d.%m.%Y')
+        state = {'promotions': [{'title': 'Kampanya', 'price': 999}], 'itineraries': [
+            {'flightNumber': f"TK {2600 + i}", 'originCode': 'DIY', 'destinationCode': 'IST',
+             'departureDateTime': day.replace(hour=5 + i % 17).isoformat(),
+             'fares': [{'brand': 'EcoFly', 'amount': 1800 + 25 * i}, {'brand': 'Business', 'amount': 5600 + 75 * i}]}
+            for i in range(flights)
+        ]}
+        block = f'<script type="application/json" id="booking-state">{json.dumps(state)}</script>\n</body>'
+        with open(os.path.join(page_dir, f"DIY-IST-{day:%d-%m-%Y}.html"), 'w', encoding='utf-8') as f:
+            f.write(page.replace('</body>', block, 1))
+
+
+def bench_fast_path(results, dates):
+    from flight_monitor import FlightPriceMonitor
+    dates_list = travel_dates(dates, '%d.%m.%Y')
+    page_dir = os.path.join(os.getcwd(), 'state_pages')
+    os.makedirs(page_dir, exist_ok=True)
+    state_pages(page_dir, dates_list)
+    server, base_url = start_replay_server(SERPAPI_FIXTURES, 0, 0.0, page_dir=page_dir)
+    with open('config.json', 'w', encoding='utf-8') as f:
+        json.dump({'replay_pages': base_url, 'fast_path': True, 'price_threshold': 0,
+                   'host_min_interval_seconds': 0, 'dates': dates_list}, f)
+    monitor = quiet(FlightPriceMonitor)
+    # Unlike the SerpApi cycle, sleeps stay in: fast-path answers must not wait out the browser's pause
+    try:
+        results[f"cycle_fast_path/{dates}_dates_replay"] = timed(lambda: quiet(monitor.check_and_notify), 3)
+        fares = [p['price'] for p in monitor.fast_path.fetch(monitor.watchlist.queries()[0])]
+    finally:
+        server.shutdown()
+    assert 999 not in fares, "fast path took the promotion price for a fare"
+    assert monitor.driver_pool is None, "fast path fell back to the browser"
+    assert monitor.fast_path.stats['hits'] and not monitor.fast_path.stats['misses'], monitor.fast_path.stats
+
+
+def bench_browser(results, base_url, dates):
+    from flight_monitor import FlightPriceMonitor
+    with open('config.json', 'w', encoding='utf-8') as f:
+        json.dump({'replay_pages': base_url, 'fast_path': False, 'price_threshold': 0,
+                   'dates': travel_dates(dates, '%d.%m.%Y')}, f)
+    monitor = quiet(FlightPriceMonitor)
+    try:
+        # Start Chrome once up front so a missing browser is reported instead of timed
+        with monitor.get_driver_pool().lease():
+            pass
+        started = time.perf_counter()
+        quiet(monitor.check_and_notify)
+        results[f"cycle_selenium/{dates}_dates_replay"] = time.perf_counter() - started
+    except Exception as e:
+        print(f"⚠️  Skipping browser benchmark: {str(e).splitlines()[0]}")
+    finally:
+        monitor.close_driver_pool()
+
+
+def compare(results, baseline_file):
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before and seconds > before * (1 + TOLERANCE) and seconds - before > NOISE_FLOOR:
+            regressions.append(name)
+            print(f"   🔺 {name}: {before * 1000:.3f}ms → {seconds * 1000:.3f}ms (+{(seconds / before - 1):.0%})")
+    if not regressions:
+        print(f"✅ No measurement more than {TOLERANCE:.0%} slower than {baseline_file}")
+    return regressions
+
+
+def option(name):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return os.path.abspath(sys.argv[index + 1])
+    return None
+
+
+if __name__ == "__main__":
+    save_file = option('--save')
+    baseline_file = option('--compare')
+    workdir = tempfile.mkdtemp(prefix='bench_replay_')
+    os.chdir(workdir)
+    server, base_url = start_replay_server(SERPAPI_FIXTURES, 0, 0.0, page_dir=PAGE_FIXTURES)
+    results = {}
+    try:
+        bench_parsing(results)
+        for concurrency in (1, 8):
+            bench_cycle(results, base_url, 8, concurrency)
+        for size in (100, 2000):
+            bench_history_writes(results, size)
+        bench_fast_path(results, 4)
+        if '--browser' in sys.argv:
+            bench_browser(results, base_url, 4)
+    finally:
+        server.shutdown()
+        os.chdir(ROOT)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"📏 {len(results)} measurements")
+    for name, seconds in results.items():
+        print(f"   {name:<45} {seconds * 1000:10.3f} ms")
+    if save_file:
+        with open(save_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Saved to {save_file}")
+    if baseline_file and compare(results, baseline_file):
+        sys.exit(1)
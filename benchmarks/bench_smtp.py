@@ -0,0 +1,72 @@
+"""
+SMTP notifier benchmark against a local aiosmtpd server
+Compares one connection per message (the old behaviour) with the persistent SmtpNotifier
+
+Usage: pip install aiosmtpd && python benchmarks/bench_smtp.py [messages]
+"""
+
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+from email_notifier import SmtpNotifier
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def bench_per_message(port, count):
+    notifier = SmtpNotifier('monitor@localhost', '', 'me@localhost', host='127.0.0.1', port=port, use_tls=False)
+    started = time.perf_counter()
+    for i in range(count):
+        server = smtplib.SMTP('127.0.0.1', port)
+        server.send_message(notifier._build(f"Alert {i}", "<p>price</p>"))
+        server.quit()
+    return time.perf_counter() - started
+
+
+def bench_persistent(port, count):
+    notifier = SmtpNotifier('monitor@localhost', '', 'me@localhost', host='127.0.0.1', port=port, use_tls=False)
+    started = time.perf_counter()
+    for i in range(count):
+        notifier.send(f"Alert {i}", "<p>price</p>")
+    notifier.close()
+    return time.perf_counter() - started
+
+
+def bench_digest(port, count):
+    notifier = SmtpNotifier('monitor@localhost', '', 'me@localhost', host='127.0.0.1', port=port, use_tls=False,
+                            digest_seconds=60)
+    started = time.perf_counter()
+    for i in range(count):
+        notifier.send(f"Alert {i}", "<p>price</p>")
+    notifier.flush()
+    elapsed = time.perf_counter() - started
+    notifier.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    handler = CountingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=8025)
+    controller.start()
+    try:
+        for name, bench in (('connection per message', bench_per_message),
+                            ('persistent connection', bench_persistent),
+                            ('digest', bench_digest)):
+            before = handler.received
+            elapsed = bench(controller.port, count)
+            print(f"{name:24s} {count / elapsed:8.1f} alerts/s  ({handler.received - before} emails delivered)")
+    finally:
+        controller.stop()
@@ -0,0 +1,141 @@
+"""
+Bounded pool of reusable Selenium WebDriver instances
+Avoids paying a headless Chrome cold start for every date check
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import WebDriverException
+
+
+class DriverPool:
+    def __init__(self, factory, size=2, max_uses=10):
+        """Create a pool that builds drivers with factory() on demand"""
+        self.factory = factory
+        self.size = max(1, int(size))
+        self.max_uses = max(1, int(max_uses))
+        self._idle = []
+        self._uses = {}
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.stats = {
+            'leases': 0,
+            'created': 0,
+            'recycled': 0,
+            'crashed': 0,
+            'lease_wait_total': 0.0,
+            'lease_wait_max': 0.0
+        }
+
+    def _acquire(self):
+        """Take an idle driver, start a new one, or wait for a release"""
+        started = time.monotonic()
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    driver = self._idle.pop()
+                    break
+                if self._created < self.size:
+                    # Reserve the slot before starting Chrome outside the lock
+                    self._created += 1
+                    driver = None
+                    break
+                self._cond.wait()
+
+        if driver is None:
+            try:
+                driver = self.factory()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._uses[id(driver)] = 0
+                self.stats['created'] += 1
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self.stats['leases'] += 1
+            self.stats['lease_wait_total'] += waited
+            self.stats['lease_wait_max'] = max(self.stats['lease_wait_max'], waited)
+        return driver
+
+    def _discard(self, driver):
+        """Quit a driver and free its slot"""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._cond:
+            self._uses.pop(id(driver), None)
+            self._created -= 1
+            self._cond.notify()
+
+    def reset_driver(self, driver):
+        """Clear cookies, storage and navigation state between leases"""
+        driver.delete_all_cookies()
+        driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}")
+        driver.get("about:blank")
+
+    def _release(self, driver, crashed=False):
+        """Return a driver to the pool, recycling it when worn out or broken"""
+        with self._cond:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            worn_out = self._uses[id(driver)] >= self.max_uses
+            closed = self._closed
+
+        if not crashed and not worn_out and not closed:
+            try:
+                self.reset_driver(driver)
+            except Exception:
+                crashed = True
+
+        if crashed or worn_out or closed:
+            with self._cond:
+                if crashed:
+                    self.stats['crashed'] += 1
+                if not closed:
+                    self.stats['recycled'] += 1
+            self._discard(driver)
+            return
+
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self):
+        """Lease a driver for the duration of a with-block"""
+        driver = self._acquire()
+        crashed = False
+        try:
+            yield driver
+        except WebDriverException:
+            crashed = True
+            raise
+        finally:
+            self._release(driver, crashed=crashed)
+
+    def get_stats(self):
+        """Return a snapshot of pool counters"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['live'] = self._created
+            stats['idle'] = len(self._idle)
+        leases = stats['leases']
+        stats['lease_wait_avg'] = stats['lease_wait_total'] / leases if leases else 0.0
+        return stats
+
+    def close(self):
+        """Quit every idle driver; leased drivers are quit on release"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for driver in idle:
+            self._discard(driver)
@@ -0,0 +1,135 @@
+"""
+Persistent SMTP notifier
+Keeps one authenticated connection open across cycles and can merge alerts into a digest
+"""
+
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+
+class SmtpNotifier:
+    def __init__(self, sender_email, sender_password, recipient_email, host='smtp.gmail.com', port=587,
+                 use_tls=True, digest_seconds=0, probe_after=60, timeout=30):
+        """
+        digest_seconds > 0 collects alerts raised within that window into one email
+        probe_after is how long a connection may sit idle before it is checked with NOOP
+        """
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.recipient_email = recipient_email
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.digest_seconds = digest_seconds
+        self.probe_after = probe_after
+        self.timeout = timeout
+        self.server = None
+        self.last_used = 0.0
+        self.pending = []
+        self._timer = None
+        self._lock = threading.RLock()
+        self.stats = {'sent': 0, 'connects': 0, 'reconnects': 0, 'digests': 0}
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.sender_password:
+            server.login(self.sender_email, self.sender_password)
+        self.server = server
+        self.stats['connects'] += 1
+
+    def _disconnect(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+    def _ensure_connection(self):
+        """Reuse the open connection, probing it first if it has been idle a while"""
+        if self.server is not None and time.monotonic() - self.last_used > self.probe_after:
+            try:
+                if self.server.noop()[0] != 250:
+                    self._disconnect()
+            except (smtplib.SMTPException, OSError):
+                self.server = None
+        if self.server is None:
+            self._connect()
+
+    def _build(self, subject, html):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['To'] = self.recipient_email
+        msg['Subject'] = subject
+        # utf-8 forces base64 transfer encoding, which wraps long single-line HTML bodies
+        msg.attach(MIMEText(html, 'html', 'utf-8'))
+        return msg
+
+    def _deliver(self, msg):
+        """Send over the persistent connection, reconnecting once if it dropped"""
+        with self._lock:
+            self._ensure_connection()
+            try:
+                self.server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, OSError):
+                self.server = None
+                self.stats['reconnects'] += 1
+                self._connect()
+                self.server.send_message(msg)
+            self.last_used = time.monotonic()
+            self.stats['sent'] += 1
+
+    def send(self, subject, html):
+        """
+        Send now, or queue for the digest when a digest window is configured; a queued alert
+        returns a Future that resolves to True once the digest went out and False if it failed
+        """
+        if not self.digest_seconds:
+            self._deliver(self._build(subject, html))
+            return None
+        receipt = Future()
+        with self._lock:
+            self.pending.append((subject, html, receipt))
+            if self._timer is None:
+                self._timer = threading.Timer(self.digest_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return receipt
+
+    def flush(self):
+        """Send everything queued for the digest as one email"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        if len(pending) == 1:
+            subject, html, _ = pending[0]
+        else:
+            subject = f"🎉 Flight Price Digest - {len(pending)} alerts"
+            html = "\n<hr>\n".join(body for _, body, _ in pending)
+        try:
+            self._deliver(self._build(subject, html))
+            if len(pending) > 1:
+                self.stats['digests'] += 1
+            print("✅ Email digest sent!")
+            delivered = True
+        except Exception as e:
+            print(f"❌ Error sending email digest: {str(e)}")
+            delivered = False
+        for _, _, receipt in pending:
+            receipt.set_result(delivered)
+
+    def close(self):
+        """Flush any digest and close the connection"""
+        self.flush()
+        with self._lock:
+            self._disconnect()
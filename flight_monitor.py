@@ -6,26 +6,75 @@ Monitors flight prices by navigating the actual booking flow
 import time
 import json
 import os
-from datetime import datetime
+import sys
+from datetime import datetime, timedelta
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import requests
-import re
+from http_transport import get_transport
+from telegram_sender import TelegramSender, TELEGRAM_API
+from email_notifier import SmtpNotifier
+from notification_queue import NotificationQueue
+from concurrent.futures import ThreadPoolExecutor
+from driver_pool import DriverPool
+from price_store import open_price_store, history_route, entries_by_route
+from observations import PriceColumns
+from price_stats import PriceStatsBook, promote_result
+from price_analytics import analytics_available, compute_price_stats, apply_price_analytics
+from rate_limit import HostLimiter
+from selector_cache import SelectorCache
+from waits import WaitEngine, page_ready, element_gone, autocomplete_visible, results_populated, prices_stable
+from watchlist import Watchlist, load_watchlist
+from travel_dates import parse_travel_date, parse_calendar_day, format_like
+from price_extraction import PRICE_PATTERN, parse_try_amount, extract_prices
+from replay_server import page_fixture_names
+from metrics import setup_metrics
+from profiling import profile_cycle, profile_prefix
+from scheduler import CheckScheduler
+from tk_fast_path import FastPathFetcher, booking_url, TK_BASE
+
+TK_HOST = 'www.turkishairlines.com'
+
+# Day cells of the fare calendar shown above the results (lowest fare for the days around the searched one)
+PRICE_GRID_SELECTORS = [
+    "[class*='fare-calendar'] li",
+    "[class*='date-tab']",
+    "[class*='calendar-day']",
+    "[data-testid*='date-tab']",
+    "[class*='flexible'] [class*='day']"
+]
+PRICE_GRID_SCRIPT = """
+for (const selector of arguments[0]) {
+    const cells = document.querySelectorAll(selector);
+    if (cells.length >= 3) {
+        return {selector: selector, cells: Array.from(cells, cell => cell.innerText || '')};
+    }
+}
+return null;
+"""
 
 class FlightPriceMonitor:
-    def __init__(self, config_file='config.json'):
-        """Initialize the flight price monitor"""
+    def __init__(self, config_file='config.json', overrides=None):
+        """Initialize the flight price monitor; overrides replace top-level config settings"""
         self.config = self.load_config(config_file)
+        self.config.update(overrides or {})
+        self.metrics = setup_metrics(self.config)
+        self.watchlist = Watchlist(load_watchlist(self.config))
+        self.transport = get_transport(self.config)
+        self.email_notifier = None
+        self.telegram_sender = None
+        self.notification_queue = self.setup_notification_queue()
+        self.history_store = open_price_store(self.config)
         self.price_history = self.load_price_history()
+        self.price_stats = self.load_price_stats()
+        self.driver_pool = None
+        self.host_limiter = HostLimiter(self.config.get('host_min_interval_seconds', 2))
+        self.wait_engine = WaitEngine(self.config.get('wait_budgets'), metrics=self.metrics)
+        self.selector_cache = SelectorCache(self.config.get('selector_cache_file', 'selector_cache.json'),
+                                            metrics=self.metrics)
+        self.scheduler = self.setup_scheduler()
+        self.fast_path = self.setup_fast_path()
         
     def load_config(self, config_file):
         """Load configuration from JSON file or environment variables"""
@@ -38,16 +87,61 @@ class FlightPriceMonitor:
                 'origin': os.getenv('ORIGIN', 'DIY'),  # Diyarbakır
                 'destination': os.getenv('DESTINATION', 'IST'),  # Istanbul
                 'dates': os.getenv('DATES', '04.02.2026,05.02.2026,06.02.2026,07.02.2026').split(','),
+                'driver_pool_size': int(os.getenv('DRIVER_POOL_SIZE', 2)),
+                'driver_max_uses': int(os.getenv('DRIVER_MAX_USES', 10)),
+                'parallel_workers': int(os.getenv('PARALLEL_WORKERS', 1)),
+                'price_grid': os.getenv('PRICE_GRID', 'false').lower() == 'true',
+                'replay_pages': os.getenv('REPLAY_PAGES', ''),
+                'fast_path': os.getenv('FAST_PATH', 'false').lower() == 'true',
+                'host_min_interval_seconds': float(os.getenv('HOST_MIN_INTERVAL', 2)),
+                'history_backend': os.getenv('HISTORY_BACKEND', 'json'),
+                'scheduler': {
+                    'enabled': os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true',
+                    'min_interval_minutes': int(os.getenv('SCHEDULER_MIN_INTERVAL', 15)),
+                    'max_interval_minutes': int(os.getenv('SCHEDULER_MAX_INTERVAL', 1440)),
+                    'max_checks_per_hour': float(os.getenv('MAX_CHECKS_PER_HOUR', 0))
+                },
+                'metrics': {
+                    'enabled': os.getenv('METRICS_ENABLED', 'false').lower() == 'true',
+                    'port': int(os.getenv('METRICS_PORT', 9108)),
+                    'json_log': os.getenv('METRICS_JSON_LOG', '')
+                },
+                'supervisor': {
+                    'workers': int(os.getenv('SUPERVISOR_WORKERS', 0)),
+                    'alert_dedup_minutes': int(os.getenv('ALERT_DEDUP_MINUTES', 360))
+                },
+                'job_queue': {
+                    'backend': os.getenv('JOB_QUEUE_BACKEND', 'sqlite'),
+                    'redis_url': os.getenv('REDIS_URL', ''),
+                    'visibility_timeout_seconds': int(os.getenv('JOB_VISIBILITY_TIMEOUT', 600))
+                },
+                'alert_rules': {
+                    'enabled': os.getenv('ALERT_RULES_ENABLED', 'false').lower() == 'true',
+                    'window_days': int(os.getenv('ALERT_WINDOW_DAYS', 14)),
+                    'ewma_drop_percent': float(os.getenv('ALERT_EWMA_DROP_PERCENT', 15))
+                },
+                'analytics': {
+                    'enabled': os.getenv('ANALYTICS_ENABLED', 'false').lower() == 'true',
+                    'window_days': int(os.getenv('ANALYTICS_WINDOW_DAYS', 7)),
+                    'drop_percent': float(os.getenv('ANALYTICS_DROP_PERCENT', 15))
+                },
                 'telegram': {
                     'enabled': bool(os.getenv('TELEGRAM_BOT_TOKEN')),
                     'bot_token': os.getenv('TELEGRAM_BOT_TOKEN', ''),
-                    'chat_id': os.getenv('TELEGRAM_CHAT_ID', '')
+                    'chat_id': os.getenv('TELEGRAM_CHAT_ID', ''),
+                    'api_base': os.getenv('TELEGRAM_API_BASE', TELEGRAM_API)
+                },
+                'notification_queue': {
+                    'enabled': os.getenv('NOTIFY_QUEUE_ENABLED', 'false').lower() == 'true'
                 },
                 'email': {
                     'enabled': os.getenv('EMAIL_ENABLED', 'false').lower() == 'true',
                     'sender_email': os.getenv('EMAIL_SENDER', ''),
                     'sender_password': os.getenv('EMAIL_PASSWORD', ''),
-                    'recipient_email': os.getenv('EMAIL_RECIPIENT', '')
+                    'recipient_email': os.getenv('EMAIL_RECIPIENT', ''),
+                    'smtp_host': os.getenv('EMAIL_SMTP_HOST', 'smtp.gmail.com'),
+                    'smtp_port': int(os.getenv('EMAIL_SMTP_PORT', 587)),
+                    'digest_seconds': int(os.getenv('EMAIL_DIGEST_SECONDS', 0))
                 }
             }
         
@@ -61,17 +155,81 @@ class FlightPriceMonitor:
             return {}
     
     def load_price_history(self):
-        """Load price history from file"""
+        """Load price history from file (with a history store, only unsaved entries are kept in memory)"""
+        if self.history_store is not None:
+            route = history_route(self.config)
+            if not self.history_store.has_route(route):
+                imported = self.history_store.import_json(route)
+                if imported:
+                    print(f"📦 Imported {imported} entries from price_history.json")
+            return {}
+        
         history_file = 'price_history.json'
         if os.path.exists(history_file):
             with open(history_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return {}
     
+    def load_price_stats(self):
+        """Load running per-date statistics used by the incremental alert rules"""
+        rules = self.config.get('alert_rules', {})
+        if not rules.get('enabled', False):
+            return None
+        
+        book = PriceStatsBook(
+            rules.get('stats_file', 'price_stats.json'),
+            window_days=rules.get('window_days', 14),
+            ewma_alpha=rules.get('ewma_alpha', 0.3),
+            ewma_drop_percent=rules.get('ewma_drop_percent', 15)
+        )
+        if not book.loaded:
+            replayed = sum(book.rebuild(route, self.route_history(route)) for route in self.watchlist.routes())
+            if replayed:
+                print(f"📈 Rebuilt running price stats from {replayed} history entries")
+        return book
+    
+    def route_history(self, route):
+        """(key, entry) pairs of one route, from the history store or price_history.json"""
+        if self.history_store is not None:
+            return self.history_store.iter_entries(route)
+        default_route = history_route(self.config)
+        return ((key, entry) for key, entry in self.price_history.items()
+                if entry.get('route', default_route) == route)
+    
+    def history_key(self, query, at=None):
+        """History key for a search checked at `at` (now); the classic route keeps the plain date_timestamp keys"""
+        key = f"{query.date}_{(at or datetime.now()).strftime('%Y%m%d_%H%M')}"
+        if query.route == history_route(self.config):
+            return key
+        return f"{query.route}_{key}"
+    
+    def apply_alert_rules(self, all_results):
+        """Update running stats with this cycle's prices and promote rule hits to alerts"""
+        now = int(time.time())
+        observed = {}
+        for r in all_results:
+            # Watches sharing a search share one observation
+            key = (r['route'], r['date'])
+            if key not in observed:
+                observed[key] = self.price_stats.observe(r['route'], r['date'], now, r['min_price'])
+                if observed[key]:
+                    print(f"   📈 {r['date'].strip()}: {', '.join(observed[key])}")
+            promote_result(r, observed[key])
+    
     def save_price_history(self):
         """Save price history to file"""
-        with open('price_history.json', 'w', encoding='utf-8') as f:
-            json.dump(self.price_history, f, indent=2, ensure_ascii=False)
+        if self.price_stats is not None:
+            self.price_stats.save()
+        
+        with self.metrics.span('history_save', backend=self.config.get('history_backend', 'json')):
+            if self.history_store is not None:
+                for route, entries in entries_by_route(self.price_history, history_route(self.config)).items():
+                    self.history_store.append_many(route, entries)
+                self.price_history.clear()
+                return
+            
+            with open('price_history.json', 'w', encoding='utf-8') as f:
+                json.dump(self.price_history, f, indent=2, ensure_ascii=False)
     
     def setup_driver(self):
         """Setup Selenium WebDriver with headless Chrome"""
@@ -86,23 +244,33 @@ class FlightPriceMonitor:
         chrome_options.add_experimental_option('useAutomationExtension', False)
         chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        with self.metrics.span('driver_start'):
+            driver = webdriver.Chrome(options=chrome_options)
+            driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         return driver
     
+    def get_driver_pool(self):
+        """Return the shared driver pool, creating it on first use"""
+        if self.driver_pool is None:
+            # Every parallel worker needs its own browser
+            size = max(self.config.get('driver_pool_size', 2), self.config.get('parallel_workers', 1))
+            self.driver_pool = DriverPool(
+                self.setup_driver,
+                size=size,
+                max_uses=self.config.get('driver_max_uses', 10)
+            )
+        return self.driver_pool
+    
+    def close_driver_pool(self):
+        """Quit all pooled browsers"""
+        if self.driver_pool is not None:
+            self.driver_pool.close()
+            self.driver_pool = None
+    
     def extract_price(self, price_text):
         """Extract numeric price from text"""
-        try:
-            # Remove currency symbols and convert to float
-            # Turkish Airlines uses format like "1.234,56 TL"
-            price_clean = price_text.replace('TL', '').replace('₺', '').replace('.', '').replace(',', '.').strip()
-            # Extract just the number
-            match = re.search(r'[\d.]+', price_clean)
-            if match:
-                return float(match.group())
-            return None
-        except:
-            return None
+        # Turkish Airlines uses format like "1.234,56 TL"
+        return parse_try_amount(price_text)
     
     def search_flights(self, driver, origin, destination, date):
         """Search for flights using Turkish Airlines website"""
@@ -110,13 +278,12 @@ class FlightPriceMonitor:
             print(f"\n🔍 Searching flights: {origin} → {destination} on {date}")
             
             # Go to Turkish Airlines homepage
-            driver.get("https://www.turkishairlines.com/tr-tr/")
-            time.sleep(5)
+            self.host_limiter.wait(TK_HOST)
+            with self.metrics.span('navigate', page='home'):
+                driver.get("https://www.turkishairlines.com/tr-tr/")
             
             # Wait for page to load
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            self.wait_engine.wait(driver, 'page_load', page_ready)
             
             # Handle any cookie consent popups
             try:
@@ -124,7 +291,7 @@ class FlightPriceMonitor:
                 for btn in cookie_buttons:
                     if btn.is_displayed():
                         btn.click()
-                        time.sleep(1)
+                        self.wait_engine.wait(driver, 'cookie_banner', element_gone(btn))
                         break
             except:
                 pass
@@ -140,14 +307,15 @@ class FlightPriceMonitor:
             ]
             
             origin_filled = False
-            for selector in origin_selectors:
+            for selector in self.selector_cache.ordered('origin', origin_selectors):
                 try:
                     origin_field = driver.find_element(By.CSS_SELECTOR, selector)
                     origin_field.clear()
                     origin_field.send_keys(origin)
-                    time.sleep(2)
+                    self.wait_engine.wait(driver, 'autocomplete', autocomplete_visible)
                     origin_field.send_keys(Keys.ENTER)
                     origin_filled = True
+                    self.selector_cache.record_win('origin', selector)
                     print(f"   ✓ Origin set: {origin}")
                     break
                 except:
@@ -155,11 +323,11 @@ class FlightPriceMonitor:
             
             if not origin_filled:
                 print("   ⚠️ Could not find origin field")
+                self.selector_cache.record_failure('origin')
+                self.metrics.inc('stage_failures_total', stage='fill_origin')
                 # Save screenshot for debugging
                 driver.save_screenshot(f"debug_origin_{date.replace('.', '-')}.png")
             
-            time.sleep(2)
-            
             # Fill destination field
             dest_selectors = [
                 "input[placeholder*='Nereye']",
@@ -170,14 +338,15 @@ class FlightPriceMonitor:
             ]
             
             dest_filled = False
-            for selector in dest_selectors:
+            for selector in self.selector_cache.ordered('destination', dest_selectors):
                 try:
                     dest_field = driver.find_element(By.CSS_SELECTOR, selector)
                     dest_field.clear()
                     dest_field.send_keys(destination)
-                    time.sleep(2)
+                    self.wait_engine.wait(driver, 'autocomplete', autocomplete_visible)
                     dest_field.send_keys(Keys.ENTER)
                     dest_filled = True
+                    self.selector_cache.record_win('destination', selector)
                     print(f"   ✓ Destination set: {destination}")
                     break
                 except:
@@ -185,8 +354,8 @@ class FlightPriceMonitor:
             
             if not dest_filled:
                 print("   ⚠️ Could not find destination field")
-            
-            time.sleep(2)
+                self.selector_cache.record_failure('destination')
+                self.metrics.inc('stage_failures_total', stage='fill_destination')
             
             # Note: Date selection in Turkish Airlines is complex
             # For now, we'll try to get current prices and extract date info
@@ -201,12 +370,13 @@ class FlightPriceMonitor:
             ]
             
             search_clicked = False
-            for selector in search_selectors:
+            for selector in self.selector_cache.ordered('search', search_selectors):
                 try:
                     search_btn = driver.find_element(By.CSS_SELECTOR, selector)
                     if search_btn.is_displayed():
                         search_btn.click()
                         search_clicked = True
+                        self.selector_cache.record_win('search', selector)
                         print("   ✓ Search button clicked")
                         break
                 except:
@@ -215,10 +385,12 @@ class FlightPriceMonitor:
             if search_clicked:
                 # Wait for results to load
                 print("   ⏳ Waiting for results...")
-                time.sleep(15)
+                self.wait_for_results(driver)
                 return True
             else:
                 print("   ⚠️ Could not find/click search button")
+                self.selector_cache.record_failure('search')
+                self.metrics.inc('stage_failures_total', stage='click_search')
                 driver.save_screenshot(f"debug_search_{date.replace('.', '-')}.png")
                 return False
                 
@@ -226,34 +398,21 @@ class FlightPriceMonitor:
             print(f"   ❌ Error during search: {str(e)}")
             return False
     
+    def wait_for_results(self, driver):
+        """Wait until prices are rendered and have stopped changing"""
+        if self.wait_engine.wait(driver, 'results', results_populated):
+            self.wait_engine.wait(driver, 'prices_stable', prices_stable(), poll_frequency=1.0)
+    
     def extract_prices_from_page(self, driver, date):
         """Extract all prices from the current page"""
         prices = []
         
         try:
-            # Get all text from page
-            body_text = driver.find_element(By.TAG_NAME, "body").text
-            
-            # Find all TL amounts
-            price_pattern = r'(\d{1,3}(?:[.,]\d{3})*(?:[.,]\d{2})?)\s*(?:TL|₺)'
-            matches = re.findall(price_pattern, body_text)
-            
-            for match in matches:
-                price = self.extract_price(match + " TL")
-                if price and price > 100 and price < 50000:  # Reasonable flight price range
-                    prices.append({
-                        'price': price,
-                        'text': f"{match} TL",
-                        'date': date
-                    })
-            
-            # Remove duplicates
-            unique_prices = {}
-            for p in prices:
-                if p['price'] not in unique_prices:
-                    unique_prices[p['price']] = p
-            
-            prices = list(unique_prices.values())
+            # Only the price strings of visible text nodes cross the WebDriver wire; duplicates are dropped
+            with self.metrics.span('extract') as span:
+                prices = extract_prices(driver, date)
+                if not prices:
+                    span.fail('no prices')
             
             if prices:
                 print(f"   ✅ Found {len(prices)} unique prices:")
@@ -271,39 +430,191 @@ class FlightPriceMonitor:
         
         return prices
     
-    def check_flight_prices(self, date):
-        """Check flight prices for a specific date"""
-        driver = None
+    def read_price_grid(self, driver, query):
+        """Lowest fare per day from the results page's fare calendar, keyed like the watchlist dates"""
         try:
-            driver = self.setup_driver()
-            
-            origin = self.config.get('origin', 'DIY')
-            destination = self.config.get('destination', 'IST')
-            
-            if self.search_flights(driver, origin, destination, date):
-                prices = self.extract_prices_from_page(driver, date)
-                return prices
-            else:
-                # Try alternative: direct URL to booking page
-                print("   🔄 Trying alternative approach...")
-                driver.get(f"https://www.turkishairlines.com/tr-tr/ucak-bileti/arama/")
-                time.sleep(10)
-                prices = self.extract_prices_from_page(driver, date)
+            anchor = parse_travel_date(query.date)
+            found = driver.execute_script(
+                PRICE_GRID_SCRIPT, self.selector_cache.ordered('price_grid', PRICE_GRID_SELECTORS)
+            )
+        except Exception:
+            found = None
+        if not found:
+            self.selector_cache.record_failure('price_grid')
+            return {}
+        self.selector_cache.record_win('price_grid', found['selector'])
+        
+        grid = {}
+        for cell in found['cells']:
+            day = parse_calendar_day(cell, anchor)
+            match = PRICE_PATTERN.search(cell)
+            if day is None or not match:
+                continue
+            price = self.extract_price(match.group(1) + " TL")
+            if price and price > 100 and price < 50000:
+                date = format_like(day, query.date)
+                grid[date] = [{'price': price, 'text': f"{match.group(1)} TL", 'date': date, 'source': 'calendar'}]
+        return grid
+    
+    def replay_page_url(self, query):
+        """Captured results page standing in for a search: a replay server URL or a file:// path"""
+        source = self.config['replay_pages']
+        if source.startswith(('http://', 'https://')):
+            return booking_url(query.origin, query.destination, query.date, base=source)
+        for name in page_fixture_names(query.origin, query.destination, query.date):
+            path = os.path.join(source, name)
+            if os.path.exists(path):
+                return 'file://' + os.path.abspath(path)
+        return None
+    
+    def load_replay_page(self, driver, query):
+        """Extract prices from a captured page instead of running the live search"""
+        url = self.replay_page_url(query)
+        if url is None:
+            print(f"   ⚠️ No captured page for {query.origin} → {query.destination} on {query.date}")
+            return []
+        print(f"\n🎞️  Replaying {url}")
+        with self.metrics.span('navigate', page='replay'):
+            driver.get(url)
+        self.wait_engine.wait(driver, 'page_load', page_ready)
+        return self.extract_prices_from_page(driver, query.date)
+    
+    def setup_fast_path(self):
+        """Direct HTTP fetcher tried before the browser when enabled (not when replaying from a folder)"""
+        if not self.config.get('fast_path', False):
+            return None
+        base = self.config.get('replay_pages') or TK_BASE
+        if not base.startswith(('http://', 'https://')):
+            return None
+        return FastPathFetcher(self.transport, self.host_limiter, base=base, metrics=self.metrics)
+    
+    def fetch_fast_path(self, query):
+        """Prices from the booking URL over plain HTTP, or None to fall back to the browser"""
+        if self.fast_path is None or not self.fast_path.should_try():
+            return None
+        print(f"\n⚡ Fetching {query.origin} → {query.destination} on {query.date} over HTTP")
+        with self.metrics.span('fast_path') as span:
+            prices = self.fast_path.fetch(query)
+            if not prices:
+                span.fail()
+        if prices:
+            print(f"   ✅ Found {len(prices)} unique prices without a browser:")
+            for p in sorted(prices, key=lambda x: x['price'])[:5]:
+                print(f"      💰 {p['text']}")
+        else:
+            print("   🐢 No prices over HTTP - using the browser")
+        return prices
+    
+    def check_flight_prices(self, query, grid=None):
+        """Check flight prices for one watchlist search, filling grid from the fare calendar when given"""
+        date = query.date
+        prices = self.fetch_fast_path(query)
+        if prices:
+            return prices
+        try:
+            with self.get_driver_pool().lease() as driver:
+                if self.config.get('replay_pages'):
+                    prices = self.load_replay_page(driver, query)
+                elif self.search_flights(driver, query.origin, query.destination, date):
+                    prices = self.extract_prices_from_page(driver, date)
+                else:
+                    # Try alternative: direct URL to booking page
+                    print("   🔄 Trying alternative approach...")
+                    self.host_limiter.wait(TK_HOST)
+                    with self.metrics.span('navigate', page='booking'):
+                        driver.get(booking_url(query.origin, query.destination, date))
+                    self.wait_engine.wait(driver, 'page_load', page_ready)
+                    self.wait_for_results(driver)
+                    prices = self.extract_prices_from_page(driver, date)
+                if grid is not None and prices:
+                    grid.update(self.read_price_grid(driver, query))
                 return prices
             
         except Exception as e:
             print(f"❌ Error checking prices: {str(e)}")
             return []
-        finally:
-            if driver:
-                driver.quit()
+    
+    def can_check(self, query):
+        """The homepage form is filled with route and date only, so it always searches 1 adult in economy"""
+        return query.is_default_party()
+    
+    def setup_scheduler(self):
+        """Priority scheduler that replaces the fixed check interval, when enabled"""
+        settings = self.config.get('scheduler', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        budget = None
+        if settings.get('max_checks_per_hour'):
+            budget = lambda now: settings['max_checks_per_hour'] / 60
+        scheduler = CheckScheduler(
+            base_interval=settings.get('base_interval_minutes', self.config.get('check_interval_minutes', 60)),
+            min_interval=settings.get('min_interval_minutes', 15),
+            max_interval=settings.get('max_interval_minutes', 24 * 60),
+            budget=budget
+        )
+        # Only searches the browser form flow can run are scheduled
+        scheduler.add_many([q for q in self.watchlist.queries() if self.can_check(q)], time.time())
+        return scheduler
+    
+    def run_due_checks(self):
+        """Check the searches that are due, then sleep until the next one falls due"""
+        due = self.scheduler.pop_due(time.time())
+        if due:
+            try:
+                self.check_and_notify(due)
+            finally:
+                # Back on the heap even when the cycle failed, or these searches would never run again
+                now = time.time()
+                for query in due:
+                    self.scheduler.reschedule(query, now)
+        
+        next_due = self.scheduler.next_due()
+        if next_due is None:
+            print("\n📭 Every watched date has passed - nothing left to check")
+            time.sleep(self.config.get('check_interval_minutes', 60) * 60)
+            return
+        wait = max(1, next_due - time.time())
+        print(f"\n⏰ Next check in {wait / 60:.0f} minutes ({len(self.scheduler)} searches scheduled)")
+        time.sleep(wait)
+    
+    def setup_notification_queue(self):
+        """Background delivery queue for alerts, when enabled"""
+        settings = self.config.get('notification_queue', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        notification_queue = NotificationQueue(
+            {
+                'email': lambda p: self.notify('email', p['subject'], p['message']),
+                # Chunks that already arrived are recorded in the journaled payload and not resent
+                'telegram': lambda p: self.notify('telegram', p['message'], p.setdefault('delivered', []))
+            },
+            journal_file=settings.get('file', 'pending_alerts.json'),
+            max_size=settings.get('max_size', 100),
+            max_attempts=settings.get('max_attempts', 5)
+        )
+        notification_queue.start()
+        return notification_queue
+    
+    def notify(self, channel, *args):
+        """
+        Send through one channel (email or telegram) inside a metrics span; True once delivered,
+        or a Future while an email waits for its digest
+        """
+        send = self.send_email_notification if channel == 'email' else self.send_telegram_notification
+        with self.metrics.span('notify', channel=channel) as span:
+            delivered = send(*args)
+            if not delivered:
+                span.fail()
+        return delivered
     
     def send_email_notification(self, subject, message):
         """Send email notification"""
         try:
             email_config = self.config.get('email', {})
             if not email_config.get('enabled', False):
-                return
+                return False
             
             sender_email = email_config.get('sender_email')
             sender_password = email_config.get('sender_password')
@@ -311,111 +622,211 @@ class FlightPriceMonitor:
             
             if not all([sender_email, sender_password, recipient_email]):
                 print("⚠️  Email configuration incomplete")
-                return
-            
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            
-            msg.attach(MIMEText(message, 'html'))
+                return False
             
-            # Use Gmail SMTP
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            server.quit()
+            if self.email_notifier is None:
+                self.email_notifier = SmtpNotifier(
+                    sender_email, sender_password, recipient_email,
+                    host=email_config.get('smtp_host', 'smtp.gmail.com'),
+                    port=email_config.get('smtp_port', 587),
+                    use_tls=email_config.get('smtp_tls', True),
+                    digest_seconds=email_config.get('digest_seconds', 0)
+                )
+            receipt = self.email_notifier.send(subject, message)
+            if receipt is not None:
+                print("📨 Email queued for the next digest")
+                return receipt
             
             print("✅ Email notification sent!")
+            return True
             
         except Exception as e:
             print(f"❌ Error sending email: {str(e)}")
+            return False
     
-    def send_telegram_notification(self, message):
-        """Send Telegram notification"""
+    def send_telegram_notification(self, message, delivered=None):
+        """Send Telegram notification; delivered tracks the chats and chunks that arrived across retries"""
         try:
             telegram_config = self.config.get('telegram', {})
             if not telegram_config.get('enabled', False):
-                return
+                return False
             
             bot_token = telegram_config.get('bot_token')
             chat_id = telegram_config.get('chat_id')
             
             if not all([bot_token, chat_id]):
                 print("⚠️  Telegram configuration incomplete")
-                return
+                return False
             
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            data = {
-                'chat_id': chat_id,
-                'text': message,
-                'parse_mode': 'HTML'
-            }
+            if self.telegram_sender is None:
+                self.telegram_sender = TelegramSender(
+                    bot_token, self.transport,
+                    api_base=telegram_config.get('api_base', TELEGRAM_API)
+                )
             
-            response = requests.post(url, data=data)
-            if response.status_code == 200:
+            # chat_id may list several chats separated by commas
+            if self.telegram_sender.send(chat_id, message, delivered=delivered):
                 print("✅ Telegram notification sent!")
-            else:
-                print(f"⚠️  Telegram notification failed: {response.text}")
+                return True
+            return False
                 
         except Exception as e:
             print(f"❌ Error sending Telegram: {str(e)}")
+            return False
+    
+    def check_batch(self, batch):
+        """Check a run of nearby dates: search the middle one and read the others from its fare calendar"""
+        if len(batch) == 1:
+            return [(batch[0], self.check_flight_prices(batch[0]))]
+        
+        middle = parse_travel_date(batch[0].date) + timedelta(days=(self.config.get('price_grid_days', 7) - 1) // 2)
+        anchor = min(batch, key=lambda q: abs((parse_travel_date(q.date) - middle).days))
+        grid = {}
+        results = [(anchor, self.check_flight_prices(anchor, grid))]
+        last = results[0][1]
+        for query in batch:
+            if query is anchor:
+                continue
+            if query.date in grid:
+                print(f"   📅 {query.date}: {grid[query.date][0]['text']} from the fare calendar")
+                results.append((query, grid[query.date]))
+            else:
+                self.pause_after(last)
+                last = self.check_flight_prices(query)
+                results.append((query, last))
+        return results
+    
+    def pause_after(self, prices):
+        """Small delay between date checks; after an HTTP fast-path answer the host limiter does the pacing"""
+        if not prices or any(p.get('source') != 'http' for p in prices):
+            time.sleep(5)
+    
+    def check_all_queries(self, queries):
+        """Yield (query, prices) for every unique search"""
+        workers = max(1, int(self.config.get('parallel_workers', 1)))
+        
+        if self.config.get('price_grid', False):
+            batches = self.watchlist.grid_batches(queries, self.config.get('price_grid_days', 7))
+            print(f"📅 {len(queries)} dates in {len(batches)} fare-calendar windows")
+        else:
+            batches = [[query] for query in queries]
+        
+        if workers == 1 or len(batches) < 2:
+            results = None
+            for batch in batches:
+                if results is not None:
+                    self.pause_after(results[-1][1])
+                results = self.check_batch(batch)
+                yield from results
+            return
+        
+        print(f"⚡ Checking {len(batches)} searches with {workers} parallel workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self.check_batch, batch) for batch in batches]
+            for future in futures:
+                yield from future.result()
+    
+    def record_prices(self, query, prices, at=None):
+        """Add one search's prices (checked at `at`, default now) to the history and check every watch on it"""
+        at = at or datetime.now()
+        self.price_history[self.history_key(query, at)] = {
+            'date': query.date,
+            'route': query.route,
+            'timestamp': at.isoformat(),
+            'prices': prices
+        }
+        
+        if self.scheduler is not None:
+            self.scheduler.observe(query, min(p['price'] for p in prices))
+        
+        # Each watch on this search is checked against its own threshold
+        results = self.watchlist.fan_out(query, prices)
+        for r in results:
+            if not r['alert']:
+                print(f"   📊 Lowest price: {r['min_price']} TL (threshold: {r['threshold']} TL)")
+        return results
     
-    def check_and_notify(self):
+    def check_and_notify(self, queries=None):
         """Main monitoring loop"""
+        cycle_started = time.perf_counter()
         print("=" * 60)
         print("🛫 Turkish Airlines Flight Price Monitor")
         print("=" * 60)
         print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Route: {self.config.get('origin', 'DIY')} → {self.config.get('destination', 'IST')}")
-        print(f"Monitoring {len(self.config.get('dates', []))} dates")
-        print(f"Price threshold: {self.config.get('price_threshold', 0)} TL")
+        if queries is not None:
+            print(f"Checking {len(queries)} due searches of {len(self.watchlist.queries())} watched")
+        elif len(self.watchlist.entries) == 1:
+            entry = self.watchlist.entries[0]
+            print(f"Route: {entry.origin} → {entry.destination}")
+            print(f"Monitoring {len(self.watchlist.queries())} dates")
+            print(f"Price threshold: {entry.threshold} TL")
+        else:
+            print(f"Watchlist: {len(self.watchlist.entries)} watches on {len(self.watchlist.routes())} routes")
+            print(f"Monitoring {len(self.watchlist.queries())} searches "
+                  f"({self.watchlist.shared()} shared between watches)")
         print("=" * 60)
+        queries = self.watchlist.queries() if queries is None else queries
+        
+        skipped = [q for q in queries if not self.can_check(q)]
+        if skipped:
+            print(f"⚠️  Skipping {len(skipped)} searches with another cabin or party size "
+                  f"(use flight_monitor_serpapi.py for those)")
+            queries = [q for q in queries if self.can_check(q)]
         
         all_results = []
-        threshold = self.config.get('price_threshold', float('inf'))
         
-        for date in self.config.get('dates', []):
-            prices = self.check_flight_prices(date.strip())
-            
+        for query, prices in self.check_all_queries(queries):
+            self.metrics.observe('prices_found', len(prices))
+            self.metrics.inc('checks_total', result='prices' if prices else 'empty')
             if prices:
-                # Store in history
-                history_key = f"{date}_{datetime.now().strftime('%Y%m%d_%H%M')}"
-                self.price_history[history_key] = {
-                    'date': date,
-                    'timestamp': datetime.now().isoformat(),
-                    'prices': prices
-                }
-                
-                # Check if any price is below threshold
-                low_prices = [p for p in prices if p['price'] <= threshold]
-                
-                if low_prices:
-                    all_results.append({
-                        'date': date,
-                        'low_prices': low_prices,
-                        'min_price': min(p['price'] for p in low_prices),
-                        'alert': True
-                    })
-                else:
-                    min_price = min(p['price'] for p in prices)
-                    all_results.append({
-                        'date': date,
-                        'prices': prices,
-                        'min_price': min_price,
-                        'alert': False
-                    })
-                    print(f"   📊 Lowest price: {min_price} TL (threshold: {threshold} TL)")
-            
-            # Small delay between date checks
-            time.sleep(5)
+                all_results.extend(self.record_prices(query, prices))
+        
+        if self.price_stats is not None:
+            self.apply_alert_rules(all_results)
         
         # Save history
         self.save_price_history()
         
+        if self.history_store is not None and all_results:
+            week_ago = (datetime.now() - timedelta(days=7)).isoformat()
+            print("\n📉 7-day lows:")
+            lows = self.history_store.min_prices(dict.fromkeys((r['route'], r['date']) for r in all_results),
+                                                 since=week_ago)
+            for (route, date), low in lows.items():
+                label = date.strip() if len(self.watchlist.routes()) == 1 else f"{route} {date.strip()}"
+                print(f"   {label}: {low} TL")
+        
+        if self.config.get('analytics', {}).get('enabled', False):
+            self.run_price_analytics(all_results)
+        
+        if self.fast_path is not None and any(self.fast_path.stats.values()):
+            stats = self.fast_path.stats
+            print(f"\n⚡ HTTP fast path: {stats['hits']} hits, {stats['misses']} empty, {stats['blocked']} blocked, "
+                  f"{stats['errors']} errors, {stats['skipped']} skipped")
+        
+        if self.driver_pool is not None:
+            stats = self.driver_pool.get_stats()
+            print(f"\n🧰 Driver pool: {stats['created']} started, {stats['recycled']} recycled, "
+                  f"avg lease wait {stats['lease_wait_avg']:.2f}s (max {stats['lease_wait_max']:.2f}s)")
+        
+        wait_summary = self.wait_engine.summary()
+        if wait_summary:
+            print("⏱️  Wait stages:")
+            for stage, info in wait_summary.items():
+                print(f"   {stage}: avg {info['avg']:.1f}s, max {info['max']:.1f}s, "
+                      f"{info['timeouts']}/{info['count']} timeouts (budget {info['budget']}s)")
+            self.wait_engine.reset()
+        
+        self.selector_cache.save()
+        for field in ('origin', 'destination', 'search', 'price_grid'):
+            stats = self.selector_cache.stats.get(field)
+            if stats:
+                print(f"🎯 Selector cache [{field}]: {stats['hits']} hits, {stats['misses']} misses, "
+                      f"{stats['failures']} failures ({self.selector_cache.hit_ratio(field):.0%} hit ratio)")
+        
         # Send notifications if needed
         alerts = [r for r in all_results if r.get('alert', False)]
+        self.metrics.inc('alerts_total', len(alerts))
         if alerts:
             self.send_notifications(alerts)
         else:
@@ -426,10 +837,37 @@ class FlightPriceMonitor:
                 if min_overall < float('inf'):
                     print(f"   💡 Current lowest price across all dates: {min_overall} TL")
         
+        if self.telegram_sender is not None and self.telegram_sender.latencies:
+            latency = self.telegram_sender.latency_summary()
+            print(f"\n📨 Telegram: {self.telegram_sender.stats['sent']} sent, "
+                  f"{self.telegram_sender.stats['rate_limited']} rate-limited, "
+                  f"avg {latency['avg'] * 1000:.0f}ms (p95 {latency['p95'] * 1000:.0f}ms)")
+        
+        self.metrics.observe('stage_duration_seconds', time.perf_counter() - cycle_started, stage='cycle')
+        self.metrics.log('cycle', searches=len(queries), results=len(all_results), alerts=len(alerts))
+        
         print("\n" + "=" * 60)
         print(f"✅ Check completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 60)
     
+    def run_price_analytics(self, all_results):
+        """Flag new lows and sharp drops using the full price history"""
+        if not analytics_available():
+            print("⚠️  Price analytics need numpy (pip install numpy)")
+            return
+        
+        settings = self.config.get('analytics', {})
+        for route in self.watchlist.routes():
+            results = [r for r in all_results if r['route'] == route]
+            if not results:
+                continue
+            columns = PriceColumns.from_entries(self.route_history(route))
+            stats = compute_price_stats(columns, settings.get('window_days', 7))
+            apply_price_analytics(results, stats, settings.get('drop_percent', 15))
+        for r in all_results:
+            if r.get('reason'):
+                print(f"   📉 {r['date'].strip()}: {r['reason']}")
+    
     def send_notifications(self, alerts):
         """Send notifications for price alerts"""
         subject = f"🎉 Flight Price Alert - {len(alerts)} dates below threshold!"
@@ -442,8 +880,13 @@ class FlightPriceMonitor:
         
         for alert in alerts:
             date = alert['date']
+            if len(self.watchlist.entries) > 1:
+                date = f"{date} · {alert['watch']} (≤ {alert['threshold']} TL)"
             message_html += f"<h3>📅 {date}</h3><ul>"
             message_text += f"📅 {date}\n"
+            if alert.get('reason'):
+                message_html += f"<li>📉 {alert['reason']}</li>"
+                message_text += f"  📉 {alert['reason']}\n"
             
             for price_info in alert['low_prices']:
                 message_html += f"<li>💰 {price_info['text']} - {price_info['price']} TL</li>"
@@ -455,8 +898,18 @@ class FlightPriceMonitor:
         message_html += f"<p><small>Checked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</small></p>"
         
         # Send via configured channels
-        self.send_email_notification(subject, message_html)
-        self.send_telegram_notification(message_text)
+        if self.notification_queue is not None:
+            if self.config.get('email', {}).get('enabled', False):
+                self.notification_queue.enqueue('email', {'subject': subject, 'message': message_html})
+            if self.config.get('telegram', {}).get('enabled', False):
+                self.notification_queue.enqueue('telegram', {'message': message_text})
+            print(f"📬 Alerts queued for delivery ({self.notification_queue.backlog()} pending)")
+            return
+        
+        if self.config.get('email', {}).get('enabled', False):
+            self.notify('email', subject, message_html)
+        if self.config.get('telegram', {}).get('enabled', False):
+            self.notify('telegram', message_text)
     
     def run_continuous(self):
         """Run monitoring continuously"""
@@ -464,11 +917,20 @@ class FlightPriceMonitor:
         
         while True:
             try:
+                if self.scheduler is not None:
+                    self.run_due_checks()
+                    continue
                 self.check_and_notify()
                 print(f"\n⏰ Next check in {check_interval} minutes...")
                 time.sleep(check_interval * 60)
             except KeyboardInterrupt:
                 print("\n\n👋 Monitoring stopped by user")
+                if self.notification_queue is not None:
+                    self.notification_queue.stop()
+                if self.email_notifier is not None:
+                    self.email_notifier.close()
+                self.metrics.close()
+                self.close_driver_pool()
                 break
             except Exception as e:
                 print(f"\n❌ Error in monitoring loop: {str(e)}")
@@ -477,4 +939,14 @@ class FlightPriceMonitor:
 
 if __name__ == "__main__":
     monitor = FlightPriceMonitor()
-    monitor.run_continuous()
+    if '--profile-cycle' in sys.argv:
+        # A single check under cProfile and tracemalloc instead of the continuous loop
+        try:
+            profile_cycle(monitor.check_and_notify, profile_prefix(sys.argv))
+        finally:
+            if monitor.notification_queue is not None:
+                monitor.notification_queue.stop()
+            monitor.close_driver_pool()
+            monitor.metrics.close()
+    else:
+        monitor.run_continuous()
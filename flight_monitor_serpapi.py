@@ -7,17 +7,43 @@ Free tier: 100 searches/month
 import time
 import json
 import os
-from datetime import datetime
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import requests
+import sys
+from datetime import datetime, timedelta
+from http_transport import get_transport
+from telegram_sender import TelegramSender, TELEGRAM_API
+from email_notifier import SmtpNotifier
+from notification_queue import NotificationQueue
+import asyncio
+from price_store import open_price_store, history_route, entries_by_route
+from serpapi_async import fetch_many
+from serpapi_cache import SerpApiCache, QuotaLedger
+from observations import PriceColumns
+from price_stats import PriceStatsBook, promote_result
+from price_analytics import analytics_available, compute_price_stats, apply_price_analytics
+from watchlist import Watchlist, load_watchlist
+from metrics import setup_metrics
+from profiling import profile_cycle, profile_prefix
+from scheduler import CheckScheduler, quota_budget
+
+SERPAPI_URL = "https://serpapi.com/search.json"
+SERPAPI_TRAVEL_CLASS = {'economy': 1, 'premium_economy': 2, 'business': 3, 'first': 4}
 
 class FlightPriceMonitor:
-    def __init__(self, config_file='config.json'):
-        """Initialize the flight price monitor"""
+    def __init__(self, config_file='config.json', overrides=None):
+        """Initialize the flight price monitor; overrides replace top-level config settings"""
         self.config = self.load_config(config_file)
+        self.config.update(overrides or {})
+        self.metrics = setup_metrics(self.config)
+        self.watchlist = Watchlist(load_watchlist(self.config))
+        self.transport = get_transport(self.config)
+        self.email_notifier = None
+        self.telegram_sender = None
+        self.notification_queue = self.setup_notification_queue()
+        self.history_store = open_price_store(self.config)
         self.price_history = self.load_price_history()
+        self.price_stats = self.load_price_stats()
+        self.serpapi_cache, self.quota = self.setup_serpapi_cache()
+        self.scheduler = self.setup_scheduler()
         
     def load_config(self, config_file):
         """Load configuration from JSON file or environment variables"""
@@ -31,16 +57,58 @@ class FlightPriceMonitor:
                 'destination': os.getenv('DESTINATION', 'IST'),
                 'dates': os.getenv('DATES', '2026-02-04,2026-02-05,2026-02-06,2026-02-07').split(','),
                 'serpapi_key': os.getenv('SERPAPI_KEY', ''),
+                'serpapi_concurrency': int(os.getenv('SERPAPI_CONCURRENCY', 1)),
+                'serpapi_rate_per_second': float(os.getenv('SERPAPI_RATE_PER_SECOND', 1.0)),
+                'serpapi_cache': os.getenv('SERPAPI_CACHE', 'true').lower() == 'true',
+                'serpapi_monthly_quota': int(os.getenv('SERPAPI_MONTHLY_QUOTA', 100)),
+                'history_backend': os.getenv('HISTORY_BACKEND', 'json'),
+                'scheduler': {
+                    'enabled': os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true',
+                    'min_interval_minutes': int(os.getenv('SCHEDULER_MIN_INTERVAL', 15)),
+                    'max_interval_minutes': int(os.getenv('SCHEDULER_MAX_INTERVAL', 1440)),
+                    'max_checks_per_hour': float(os.getenv('MAX_CHECKS_PER_HOUR', 0))
+                },
+                'metrics': {
+                    'enabled': os.getenv('METRICS_ENABLED', 'false').lower() == 'true',
+                    'port': int(os.getenv('METRICS_PORT', 9108)),
+                    'json_log': os.getenv('METRICS_JSON_LOG', '')
+                },
+                'supervisor': {
+                    'workers': int(os.getenv('SUPERVISOR_WORKERS', 0)),
+                    'alert_dedup_minutes': int(os.getenv('ALERT_DEDUP_MINUTES', 360))
+                },
+                'job_queue': {
+                    'backend': os.getenv('JOB_QUEUE_BACKEND', 'sqlite'),
+                    'redis_url': os.getenv('REDIS_URL', ''),
+                    'visibility_timeout_seconds': int(os.getenv('JOB_VISIBILITY_TIMEOUT', 600))
+                },
+                'alert_rules': {
+                    'enabled': os.getenv('ALERT_RULES_ENABLED', 'false').lower() == 'true',
+                    'window_days': int(os.getenv('ALERT_WINDOW_DAYS', 14)),
+                    'ewma_drop_percent': float(os.getenv('ALERT_EWMA_DROP_PERCENT', 15))
+                },
+                'analytics': {
+                    'enabled': os.getenv('ANALYTICS_ENABLED', 'false').lower() == 'true',
+                    'window_days': int(os.getenv('ANALYTICS_WINDOW_DAYS', 7)),
+                    'drop_percent': float(os.getenv('ANALYTICS_DROP_PERCENT', 15))
+                },
                 'telegram': {
                     'enabled': bool(os.getenv('TELEGRAM_BOT_TOKEN')),
                     'bot_token': os.getenv('TELEGRAM_BOT_TOKEN', ''),
-                    'chat_id': os.getenv('TELEGRAM_CHAT_ID', '')
+                    'chat_id': os.getenv('TELEGRAM_CHAT_ID', ''),
+                    'api_base': os.getenv('TELEGRAM_API_BASE', TELEGRAM_API)
+                },
+                'notification_queue': {
+                    'enabled': os.getenv('NOTIFY_QUEUE_ENABLED', 'false').lower() == 'true'
                 },
                 'email': {
                     'enabled': os.getenv('EMAIL_ENABLED', 'false').lower() == 'true',
                     'sender_email': os.getenv('EMAIL_SENDER', ''),
                     'sender_password': os.getenv('EMAIL_PASSWORD', ''),
-                    'recipient_email': os.getenv('EMAIL_RECIPIENT', '')
+                    'recipient_email': os.getenv('EMAIL_RECIPIENT', ''),
+                    'smtp_host': os.getenv('EMAIL_SMTP_HOST', 'smtp.gmail.com'),
+                    'smtp_port': int(os.getenv('EMAIL_SMTP_PORT', 587)),
+                    'digest_seconds': int(os.getenv('EMAIL_DIGEST_SECONDS', 0))
                 }
             }
         
@@ -54,19 +122,103 @@ class FlightPriceMonitor:
             return {}
     
     def load_price_history(self):
-        """Load price history from file"""
+        """Load price history from file (with a history store, only unsaved entries are kept in memory)"""
+        if self.history_store is not None:
+            route = history_route(self.config)
+            if not self.history_store.has_route(route):
+                imported = self.history_store.import_json(route)
+                if imported:
+                    print(f"📦 Imported {imported} entries from price_history.json")
+            return {}
+        
         history_file = 'price_history.json'
         if os.path.exists(history_file):
             with open(history_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         return {}
     
+    def load_price_stats(self):
+        """Load running per-date statistics used by the incremental alert rules"""
+        rules = self.config.get('alert_rules', {})
+        if not rules.get('enabled', False):
+            return None
+        
+        book = PriceStatsBook(
+            rules.get('stats_file', 'price_stats.json'),
+            window_days=rules.get('window_days', 14),
+            ewma_alpha=rules.get('ewma_alpha', 0.3),
+            ewma_drop_percent=rules.get('ewma_drop_percent', 15)
+        )
+        if not book.loaded:
+            replayed = sum(book.rebuild(route, self.route_history(route)) for route in self.watchlist.routes())
+            if replayed:
+                print(f"📈 Rebuilt running price stats from {replayed} history entries")
+        return book
+    
+    def route_history(self, route):
+        """(key, entry) pairs of one route, from the history store or price_history.json"""
+        if self.history_store is not None:
+            return self.history_store.iter_entries(route)
+        default_route = history_route(self.config)
+        return ((key, entry) for key, entry in self.price_history.items()
+                if entry.get('route', default_route) == route)
+    
+    def history_key(self, query, at=None):
+        """History key for a search checked at `at` (now); the classic route keeps the plain date_timestamp keys"""
+        key = f"{query.date}_{(at or datetime.now()).strftime('%Y%m%d_%H%M')}"
+        if query.route == history_route(self.config):
+            return key
+        return f"{query.route}_{key}"
+    
+    def query_label(self, query):
+        """The date, prefixed with the route once more than one route is watched"""
+        if len(self.watchlist.routes()) == 1:
+            return query.date
+        return f"{query.route} {query.date}"
+    
+    def apply_alert_rules(self, all_results):
+        """Update running stats with this cycle's prices and promote rule hits to alerts"""
+        now = int(time.time())
+        observed = {}
+        for r in all_results:
+            # Watches sharing a search share one observation
+            key = (r['route'], r['date'])
+            if key not in observed:
+                observed[key] = self.price_stats.observe(r['route'], r['date'], now, r['min_price'])
+                if observed[key]:
+                    print(f"   📈 {r['date'].strip()}: {', '.join(observed[key])}")
+            promote_result(r, observed[key])
+    
     def save_price_history(self):
         """Save price history to file"""
-        with open('price_history.json', 'w', encoding='utf-8') as f:
-            json.dump(self.price_history, f, indent=2, ensure_ascii=False)
+        if self.price_stats is not None:
+            self.price_stats.save()
+        
+        with self.metrics.span('history_save', backend=self.config.get('history_backend', 'json')):
+            if self.history_store is not None:
+                for route, entries in entries_by_route(self.price_history, history_route(self.config)).items():
+                    self.history_store.append_many(route, entries)
+                self.price_history.clear()
+                return
+            
+            with open('price_history.json', 'w', encoding='utf-8') as f:
+                json.dump(self.price_history, f, indent=2, ensure_ascii=False)
     
-    def check_flight_with_serpapi(self, origin, destination, date):
+    def setup_serpapi_cache(self):
+        """Response cache and monthly quota ledger for SerpApi searches"""
+        if not self.config.get('serpapi_cache', True):
+            return None, None
+        cache = SerpApiCache(
+            self.config.get('serpapi_cache_file', 'serpapi_cache.db'),
+            max_bytes=self.config.get('serpapi_cache_max_mb', 20) * 1024 * 1024
+        )
+        quota = QuotaLedger(
+            self.config.get('serpapi_quota_file', 'serpapi_quota.json'),
+            monthly_limit=self.config.get('serpapi_monthly_quota', 100)
+        )
+        return cache, quota
+    
+    def check_flight_with_serpapi(self, origin, destination, date, cabin='economy', adults=1, children=0):
         """
         Check flight prices using SerpApi Google Flights
         Free tier: 100 searches/month
@@ -87,7 +239,7 @@ class FlightPriceMonitor:
         
         try:
             # SerpApi Google Flights endpoint
-            url = "https://serpapi.com/search.json"
+            url = self.config.get('serpapi_url', SERPAPI_URL)
             params = {
                 'engine': 'google_flights',
                 'departure_id': origin,
@@ -96,68 +248,196 @@ class FlightPriceMonitor:
                 'currency': 'TRY',
                 'hl': 'tr',
                 'api_key': api_key,
-                'type': '2'  # One-way
+                'type': '2',  # One-way
+                'travel_class': SERPAPI_TRAVEL_CLASS[cabin],
+                'adults': adults,
+                'children': children
             }
             
-            response = requests.get(url, params=params, timeout=30)
-            data = response.json()
-            
-            flights = []
-            
-            if 'best_flights' in data:
-                for flight in data['best_flights']:
-                    price = flight.get('price', 0)
-                    flights.append({
-                        'price': price,
-                        'airline': flight.get('flights', [{}])[0].get('airline', 'Unknown'),
-                        'departure_time': flight.get('flights', [{}])[0].get('departure_airport', {}).get('time', ''),
-                        'arrival_time': flight.get('flights', [{}])[-1].get('arrival_airport', {}).get('time', ''),
-                        'duration': flight.get('total_duration', ''),
-                        'text': f"{price} TL"
-                    })
+            if self.serpapi_cache is not None:
+                cached = self.serpapi_cache.get(params)
+                if cached is not None:
+                    self.metrics.inc('serpapi_cache_total', result='hit')
+                    return self.parse_serpapi_flights(cached)
+                if not self.quota.spend(date):
+                    stale = self.serpapi_cache.get(params, allow_stale=True)
+                    if stale is not None:
+                        self.metrics.inc('serpapi_cache_total', result='stale')
+                        print(f"   💤 Quota low ({self.quota.remaining()} left) - using cached result for {date}")
+                        return self.parse_serpapi_flights(stale)
+                    self.metrics.inc('serpapi_quota_skips_total')
+                    print(f"   💤 Quota low ({self.quota.remaining()} left) - skipping {date} this cycle")
+                    return []
+                self.metrics.inc('serpapi_cache_total', result='miss')
             
-            if 'other_flights' in data:
-                for flight in data['other_flights']:
-                    price = flight.get('price', 0)
-                    flights.append({
-                        'price': price,
-                        'airline': flight.get('flights', [{}])[0].get('airline', 'Unknown'),
-                        'departure_time': flight.get('flights', [{}])[0].get('departure_airport', {}).get('time', ''),
-                        'arrival_time': flight.get('flights', [{}])[-1].get('arrival_airport', {}).get('time', ''),
-                        'duration': flight.get('total_duration', ''),
-                        'text': f"{price} TL"
-                    })
-            
-            return flights
+            with self.metrics.span('serpapi_request') as span:
+                response = self.transport.get(url, params=params)
+                data = response.json()
+                if response.status_code != 200 or 'error' in data:
+                    span.fail(f"HTTP {response.status_code}")
+            if self.serpapi_cache is not None and response.status_code == 200 and 'error' not in data:
+                self.serpapi_cache.put(params, data)
+            return self.parse_serpapi_flights(data)
             
         except Exception as e:
             print(f"   ❌ SerpApi error: {str(e)}")
             return []
     
-    def check_flight_prices(self, date):
-        """Check flight prices for a specific date"""
-        print(f"\n🔍 Checking flights for {date}...")
+    def parse_serpapi_flights(self, data):
+        """Turn a SerpApi Google Flights response into our flight dicts"""
+        flights = []
         
-        origin = self.config.get('origin', 'DIY')
-        destination = self.config.get('destination', 'IST')
+        if 'best_flights' in data:
+            for flight in data['best_flights']:
+                price = flight.get('price', 0)
+                flights.append({
+                    'price': price,
+                    'airline': flight.get('flights', [{}])[0].get('airline', 'Unknown'),
+                    'departure_time': flight.get('flights', [{}])[0].get('departure_airport', {}).get('time', ''),
+                    'arrival_time': flight.get('flights', [{}])[-1].get('arrival_airport', {}).get('time', ''),
+                    'duration': flight.get('total_duration', ''),
+                    'text': f"{price} TL"
+                })
         
-        prices = self.check_flight_with_serpapi(origin, destination, date)
+        if 'other_flights' in data:
+            for flight in data['other_flights']:
+                price = flight.get('price', 0)
+                flights.append({
+                    'price': price,
+                    'airline': flight.get('flights', [{}])[0].get('airline', 'Unknown'),
+                    'departure_time': flight.get('flights', [{}])[0].get('departure_airport', {}).get('time', ''),
+                    'arrival_time': flight.get('flights', [{}])[-1].get('arrival_airport', {}).get('time', ''),
+                    'duration': flight.get('total_duration', ''),
+                    'text': f"{price} TL"
+                })
         
+        return flights
+    
+    def check_flight_prices(self, query):
+        """Check flight prices for one watchlist search"""
+        print(f"\n🔍 Checking flights for {self.query_label(query)}...")
+        
+        prices = self.check_flight_with_serpapi(*query)
+        self.report_flights(prices)
+        return prices
+    
+    def report_flights(self, prices):
+        """Print the cheapest flights found for a date"""
         if prices:
             print(f"   ✅ Found {len(prices)} flights")
             for p in sorted(prices, key=lambda x: x['price'])[:5]:
                 print(f"      💰 {p['text']} - {p.get('airline', '')} ({p.get('departure_time', '')})")
         else:
             print("   ⚠️ No flights found")
+    
+    def check_all_queries(self, queries):
+        """Yield (query, prices) for every unique search, fetching concurrently when configured"""
+        concurrency = max(1, int(self.config.get('serpapi_concurrency', 1)))
         
-        return prices
+        if concurrency == 1 or len(queries) < 2:
+            for i, query in enumerate(queries):
+                if i > 0:
+                    time.sleep(3)
+                yield query, self.check_flight_prices(query)
+            return
+        
+        print(f"⚡ Fetching {len(queries)} searches, {concurrency} at a time")
+        fetched = asyncio.run(fetch_many(
+            self.check_flight_with_serpapi, queries,
+            concurrency=concurrency,
+            rate_per_second=self.config.get('serpapi_rate_per_second', 1.0)
+        ))
+        
+        for query in queries:
+            print(f"\n🔍 Checking flights for {self.query_label(query)}...")
+            prices = fetched[query]
+            self.report_flights(prices)
+            yield query, prices
+    
+    def can_check(self, query):
+        """SerpApi takes cabin and party size as parameters, so every search can be run"""
+        return True
+    
+    def setup_scheduler(self):
+        """Priority scheduler that replaces the fixed check interval, when enabled"""
+        settings = self.config.get('scheduler', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        budgets = []
+        if settings.get('max_checks_per_hour'):
+            budgets.append(lambda now: settings['max_checks_per_hour'] / 60)
+        if self.quota is not None:
+            # Spread what is left of the SerpApi month over the days still to come
+            budgets.append(quota_budget(self.quota))
+        budget = (lambda now: min(b(now) for b in budgets)) if budgets else None
+        scheduler = CheckScheduler(
+            base_interval=settings.get('base_interval_minutes', self.config.get('check_interval_minutes', 60)),
+            min_interval=settings.get('min_interval_minutes', 15),
+            max_interval=settings.get('max_interval_minutes', 24 * 60),
+            budget=budget
+        )
+        scheduler.add_many(self.watchlist.queries(), time.time())
+        return scheduler
+    
+    def run_due_checks(self):
+        """Check the searches that are due, then sleep until the next one falls due"""
+        due = self.scheduler.pop_due(time.time())
+        if due:
+            try:
+                self.check_and_notify(due)
+            finally:
+                # Back on the heap even when the cycle failed, or these searches would never run again
+                now = time.time()
+                for query in due:
+                    self.scheduler.reschedule(query, now)
+        
+        next_due = self.scheduler.next_due()
+        if next_due is None:
+            print("\n📭 Every watched date has passed - nothing left to check")
+            time.sleep(self.config.get('check_interval_minutes', 60) * 60)
+            return
+        wait = max(1, next_due - time.time())
+        print(f"\n⏰ Next check in {wait / 60:.0f} minutes ({len(self.scheduler)} searches scheduled)")
+        time.sleep(wait)
+    
+    def setup_notification_queue(self):
+        """Background delivery queue for alerts, when enabled"""
+        settings = self.config.get('notification_queue', {})
+        if not settings.get('enabled', False):
+            return None
+        
+        notification_queue = NotificationQueue(
+            {
+                'email': lambda p: self.notify('email', p['subject'], p['message']),
+                # Chunks that already arrived are recorded in the journaled payload and not resent
+                'telegram': lambda p: self.notify('telegram', p['message'], p.setdefault('delivered', []))
+            },
+            journal_file=settings.get('file', 'pending_alerts.json'),
+            max_size=settings.get('max_size', 100),
+            max_attempts=settings.get('max_attempts', 5)
+        )
+        notification_queue.start()
+        return notification_queue
+    
+    def notify(self, channel, *args):
+        """
+        Send through one channel (email or telegram) inside a metrics span; True once delivered,
+        or a Future while an email waits for its digest
+        """
+        send = self.send_email_notification if channel == 'email' else self.send_telegram_notification
+        with self.metrics.span('notify', channel=channel) as span:
+            delivered = send(*args)
+            if not delivered:
+                span.fail()
+        return delivered
     
     def send_email_notification(self, subject, message):
         """Send email notification"""
         try:
             email_config = self.config.get('email', {})
             if not email_config.get('enabled', False):
-                return
+                return False
             
             sender_email = email_config.get('sender_email')
             sender_password = email_config.get('sender_password')
@@ -165,27 +445,30 @@ class FlightPriceMonitor:
             
             if not all([sender_email, sender_password, recipient_email]):
                 print("⚠️  Email configuration incomplete")
-                return
-            
-            msg = MIMEMultipart()
-            msg['From'] = sender_email
-            msg['To'] = recipient_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(message, 'html'))
+                return False
             
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            server.quit()
+            if self.email_notifier is None:
+                self.email_notifier = SmtpNotifier(
+                    sender_email, sender_password, recipient_email,
+                    host=email_config.get('smtp_host', 'smtp.gmail.com'),
+                    port=email_config.get('smtp_port', 587),
+                    use_tls=email_config.get('smtp_tls', True),
+                    digest_seconds=email_config.get('digest_seconds', 0)
+                )
+            receipt = self.email_notifier.send(subject, message)
+            if receipt is not None:
+                print("📨 Email queued for the next digest")
+                return receipt
             
             print("✅ Email notification sent!")
+            return True
             
         except Exception as e:
             print(f"❌ Error sending email: {str(e)}")
+            return False
     
-    def send_telegram_notification(self, message):
-        """Send Telegram notification"""
+    def send_telegram_notification(self, message, delivered=None):
+        """Send Telegram notification; delivered tracks the chats and chunks that arrived across retries"""
         try:
             telegram_config = self.config.get('telegram', {})
             if not telegram_config.get('enabled', False):
@@ -198,81 +481,103 @@ class FlightPriceMonitor:
                 print("⚠️  Telegram configuration incomplete")
                 return False
             
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            data = {
-                'chat_id': chat_id,
-                'text': message,
-                'parse_mode': 'HTML'
-            }
+            if self.telegram_sender is None:
+                self.telegram_sender = TelegramSender(
+                    bot_token, self.transport,
+                    api_base=telegram_config.get('api_base', TELEGRAM_API)
+                )
             
-            response = requests.post(url, data=data)
-            if response.status_code == 200:
+            # chat_id may list several chats separated by commas
+            if self.telegram_sender.send(chat_id, message, delivered=delivered):
                 print("✅ Telegram notification sent!")
                 return True
-            else:
-                print(f"⚠️  Telegram notification failed: {response.text}")
-                return False
+            return False
                 
         except Exception as e:
             print(f"❌ Error sending Telegram: {str(e)}")
             return False
     
-    def check_and_notify(self):
+    def record_prices(self, query, prices, at=None):
+        """Add one search's flights (checked at `at`, default now) to the history and check every watch on it"""
+        at = at or datetime.now()
+        # Find minimum price
+        min_price = min(p['price'] for p in prices)
+        
+        # Store in history
+        self.price_history[self.history_key(query, at)] = {
+            'date': query.date,
+            'route': query.route,
+            'timestamp': at.isoformat(),
+            'min_price': min_price,
+            'flights': prices
+        }
+        
+        if self.scheduler is not None:
+            self.scheduler.observe(query, min_price)
+        
+        # Each watch on this search is checked against its own threshold
+        results = self.watchlist.fan_out(query, prices)
+        for r in results:
+            if not r['alert']:
+                print(f"   📊 Lowest: {min_price} TL (threshold: {r['threshold']} TL)")
+        return results
+    
+    def check_and_notify(self, queries=None):
         """Main monitoring function"""
+        cycle_started = time.perf_counter()
         print("=" * 60)
         print("🛫 Turkish Airlines Flight Price Monitor")
         print("=" * 60)
         print(f"Started at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Route: {self.config.get('origin', 'DIY')} → {self.config.get('destination', 'IST')}")
-        print(f"Monitoring {len(self.config.get('dates', []))} dates")
-        print(f"Price threshold: {self.config.get('price_threshold', 0)} TL")
+        if queries is not None:
+            print(f"Checking {len(queries)} due searches of {len(self.watchlist.queries())} watched")
+        elif len(self.watchlist.entries) == 1:
+            entry = self.watchlist.entries[0]
+            print(f"Route: {entry.origin} → {entry.destination}")
+            print(f"Monitoring {len(self.watchlist.queries())} dates")
+            print(f"Price threshold: {entry.threshold} TL")
+        else:
+            print(f"Watchlist: {len(self.watchlist.entries)} watches on {len(self.watchlist.routes())} routes")
+            print(f"Monitoring {len(self.watchlist.queries())} searches "
+                  f"({self.watchlist.shared()} shared between watches)")
         print("=" * 60)
+        queries = self.watchlist.queries() if queries is None else queries
         
         all_results = []
-        threshold = self.config.get('price_threshold', float('inf'))
         
-        for date in self.config.get('dates', []):
-            prices = self.check_flight_prices(date.strip())
-            
+        for query, prices in self.check_all_queries(queries):
+            self.metrics.observe('prices_found', len(prices))
+            self.metrics.inc('checks_total', result='prices' if prices else 'empty')
             if prices:
-                # Find minimum price
-                min_price = min(p['price'] for p in prices)
-                
-                # Store in history
-                history_key = f"{date}_{datetime.now().strftime('%Y%m%d_%H%M')}"
-                self.price_history[history_key] = {
-                    'date': date,
-                    'timestamp': datetime.now().isoformat(),
-                    'min_price': min_price,
-                    'flights': prices
-                }
-                
-                # Check if below threshold
-                low_prices = [p for p in prices if p['price'] <= threshold]
-                
-                if low_prices:
-                    all_results.append({
-                        'date': date,
-                        'low_prices': low_prices,
-                        'min_price': min_price,
-                        'alert': True
-                    })
-                else:
-                    all_results.append({
-                        'date': date,
-                        'prices': prices,
-                        'min_price': min_price,
-                        'alert': False
-                    })
-                    print(f"   📊 Lowest: {min_price} TL (threshold: {threshold} TL)")
-            
-            time.sleep(3)
+                all_results.extend(self.record_prices(query, prices))
+        
+        if self.price_stats is not None:
+            self.apply_alert_rules(all_results)
         
         # Save history
         self.save_price_history()
         
+        if self.serpapi_cache is not None:
+            stats = self.serpapi_cache.stats
+            print(f"\n🗃️  SerpApi cache: {stats['hits']} hits, {stats['stale_hits']} stale, {stats['misses']} misses "
+                  f"({self.serpapi_cache.hit_ratio():.0%} hit ratio), "
+                  f"{self.quota.remaining()}/{self.quota.monthly_limit} searches left this month")
+        
+        if self.history_store is not None and all_results:
+            week_ago = (datetime.now() - timedelta(days=7)).isoformat()
+            print("\n📉 7-day lows:")
+            lows = self.history_store.min_prices(dict.fromkeys((r['route'], r['date']) for r in all_results),
+                                                 since=week_ago)
+            for (route, date), low in lows.items():
+                label = date.strip() if len(self.watchlist.routes()) == 1 else f"{route} {date.strip()}"
+                print(f"   {label}: {low} TL")
+        
+        if self.config.get('analytics', {}).get('enabled', False):
+            self.run_price_analytics(all_results)
+        
         # Send notifications for alerts
         alerts = [r for r in all_results if r.get('alert', False)]
+        self.metrics.inc('alerts_total', len(alerts))
         if alerts:
             self.send_notifications(alerts)
         else:
@@ -282,26 +587,63 @@ class FlightPriceMonitor:
                 if min_overall < float('inf'):
                     print(f"   💡 Lowest price across all dates: {min_overall} TL")
         
+        if self.telegram_sender is not None and self.telegram_sender.latencies:
+            latency = self.telegram_sender.latency_summary()
+            print(f"\n📨 Telegram: {self.telegram_sender.stats['sent']} sent, "
+                  f"{self.telegram_sender.stats['rate_limited']} rate-limited, "
+                  f"avg {latency['avg'] * 1000:.0f}ms (p95 {latency['p95'] * 1000:.0f}ms)")
+        
+        self.metrics.observe('stage_duration_seconds', time.perf_counter() - cycle_started, stage='cycle')
+        self.metrics.log('cycle', searches=len(queries), results=len(all_results), alerts=len(alerts))
+        
         print("\n" + "=" * 60)
         print(f"✅ Check completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 60)
         
         return all_results
     
+    def run_price_analytics(self, all_results):
+        """Flag new lows and sharp drops using the full price history"""
+        if not analytics_available():
+            print("⚠️  Price analytics need numpy (pip install numpy)")
+            return
+        
+        settings = self.config.get('analytics', {})
+        for route in self.watchlist.routes():
+            results = [r for r in all_results if r['route'] == route]
+            if not results:
+                continue
+            columns = PriceColumns.from_entries(self.route_history(route))
+            stats = compute_price_stats(columns, settings.get('window_days', 7))
+            apply_price_analytics(results, stats, settings.get('drop_percent', 15))
+        for r in all_results:
+            if r.get('reason'):
+                print(f"   📉 {r['date'].strip()}: {r['reason']}")
+    
     def send_notifications(self, alerts):
         """Send notifications for price alerts"""
-        subject = f"🎉 Flight Price Alert - Prices below {self.config.get('price_threshold')} TL!"
+        if len(self.watchlist.entries) == 1:
+            threshold_note = f"Prices below your threshold of {self.watchlist.entries[0].threshold} TL"
+            subject = f"🎉 Flight Price Alert - Prices below {self.watchlist.entries[0].threshold} TL!"
+        else:
+            threshold_note = "Prices below your watch thresholds"
+            subject = f"🎉 Flight Price Alert - {len(alerts)} watches below threshold!"
         
         message_html = "<h2>✈️ Flight Price Alert!</h2>"
-        message_html += f"<p>Prices below your threshold of {self.config.get('price_threshold')} TL:</p>"
+        message_html += f"<p>{threshold_note}:</p>"
         
         message_text = "✈️ Flight Price Alert!\n\n"
-        message_text += f"Prices below your threshold of {self.config.get('price_threshold')} TL:\n\n"
+        message_text += f"{threshold_note}:\n\n"
         
         for alert in alerts:
             date = alert['date']
+            if len(self.watchlist.entries) > 1:
+                date = f"{date} · {alert['watch']} (≤ {alert['threshold']} TL)"
             message_html += f"<h3>📅 {date}</h3><ul>"
             message_text += f"📅 {date}\n"
+            if alert.get('reason'):
+                message_html += f"<li>📉 {alert['reason']}</li>"
+                message_text += f"  📉 {alert['reason']}\n"
             
             for p in sorted(alert['low_prices'], key=lambda x: x['price'])[:5]:
                 msg = f"💰 {p['text']} - {p.get('airline', '')} ({p.get('departure_time', '')} → {p.get('arrival_time', '')})"
@@ -313,24 +655,44 @@ class FlightPriceMonitor:
         
         message_html += f"<p><small>Checked at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</small></p>"
         
-        self.send_email_notification(subject, message_html)
-        self.send_telegram_notification(message_text)
+        if self.notification_queue is not None:
+            if self.config.get('email', {}).get('enabled', False):
+                self.notification_queue.enqueue('email', {'subject': subject, 'message': message_html})
+            if self.config.get('telegram', {}).get('enabled', False):
+                self.notification_queue.enqueue('telegram', {'message': message_text})
+            print(f"📬 Alerts queued for delivery ({self.notification_queue.backlog()} pending)")
+            return
+        
+        if self.config.get('email', {}).get('enabled', False):
+            self.notify('email', subject, message_html)
+        if self.config.get('telegram', {}).get('enabled', False):
+            self.notify('telegram', message_text)
     
     def run_continuous(self):
         """Run monitoring continuously"""
         check_interval = self.config.get('check_interval_minutes', 60)
         
         # Send a startup notification
-        startup_msg = f"🚀 Flight Monitor Started!\n\nRoute: {self.config.get('origin')} → {self.config.get('destination')}\nThreshold: {self.config.get('price_threshold')} TL\nCheck interval: {check_interval} minutes"
+        if self.scheduler is not None:
+            check_interval = f"adaptive, {self.scheduler.min_interval}-{self.scheduler.max_interval}"
+        startup_msg = f"🚀 Flight Monitor Started!\n\nWatching: {self.watchlist.describe()}\nCheck interval: {check_interval} minutes"
         self.send_telegram_notification(startup_msg)
         
         while True:
             try:
+                if self.scheduler is not None:
+                    self.run_due_checks()
+                    continue
                 self.check_and_notify()
                 print(f"\n⏰ Next check in {check_interval} minutes...")
                 time.sleep(check_interval * 60)
             except KeyboardInterrupt:
                 print("\n\n👋 Monitoring stopped by user")
+                if self.notification_queue is not None:
+                    self.notification_queue.stop()
+                if self.email_notifier is not None:
+                    self.email_notifier.close()
+                self.metrics.close()
                 break
             except Exception as e:
                 print(f"\n❌ Error: {str(e)}")
@@ -339,4 +701,13 @@ class FlightPriceMonitor:
 
 if __name__ == "__main__":
     monitor = FlightPriceMonitor()
-    monitor.run_continuous()
+    if '--profile-cycle' in sys.argv:
+        # A single check under cProfile and tracemalloc instead of the continuous loop
+        try:
+            profile_cycle(monitor.check_and_notify, profile_prefix(sys.argv))
+        finally:
+            if monitor.notification_queue is not None:
+                monitor.notification_queue.stop()
+            monitor.metrics.close()
+    else:
+        monitor.run_continuous()
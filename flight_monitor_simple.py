@@ -6,12 +6,18 @@ Works without Selenium - sends Telegram updates about your flight search
 import time
 import os
 from datetime import datetime
-import requests
+from http_transport import get_transport
+from telegram_sender import TelegramSender, TELEGRAM_API
+from watchlist import load_watchlist
+from tk_fast_path import booking_url
 
 class FlightPriceMonitor:
     def __init__(self):
         """Initialize the flight price monitor"""
         self.config = self.load_config()
+        self.watches = load_watchlist(self.config)
+        self.transport = get_transport(self.config)
+        self.telegram_sender = None
         self.last_check = None
         
     def load_config(self):
@@ -24,7 +30,8 @@ class FlightPriceMonitor:
             'destination': os.getenv('DESTINATION', 'IST'),
             'dates': os.getenv('DATES', '2026-02-04,2026-02-05,2026-02-06,2026-02-07').split(','),
             'telegram_bot_token': os.getenv('TELEGRAM_BOT_TOKEN', ''),
-            'telegram_chat_id': os.getenv('TELEGRAM_CHAT_ID', '')
+            'telegram_chat_id': os.getenv('TELEGRAM_CHAT_ID', ''),
+            'telegram_api_base': os.getenv('TELEGRAM_API_BASE', TELEGRAM_API)
         }
     
     def send_telegram_message(self, message):
@@ -37,39 +44,27 @@ class FlightPriceMonitor:
                 print("⚠️ Telegram not configured")
                 return False
             
-            url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-            data = {
-                'chat_id': chat_id,
-                'text': message,
-                'parse_mode': 'HTML'
-            }
+            if self.telegram_sender is None:
+                self.telegram_sender = TelegramSender(
+                    bot_token, self.transport,
+                    api_base=self.config.get('telegram_api_base', TELEGRAM_API)
+                )
             
-            response = requests.post(url, data=data, timeout=30)
-            if response.status_code == 200:
+            # chat_id may list several chats separated by commas
+            if self.telegram_sender.send(chat_id, message):
                 print("✅ Telegram message sent!")
                 return True
-            else:
-                print(f"⚠️ Telegram error: {response.text}")
-                return False
+            return False
                 
         except Exception as e:
             print(f"❌ Error sending Telegram: {str(e)}")
             return False
     
-    def get_booking_url(self, date):
-        """Generate Turkish Airlines booking URL"""
-        # Format: YYYY-MM-DD to DDMMYYYY
-        parts = date.split('-')
-        if len(parts) == 3:
-            formatted_date = f"{parts[2]}{parts[1]}{parts[0]}"
-        else:
-            formatted_date = date.replace('.', '')
-        
-        origin = self.config.get('origin', 'DIY')
-        dest = self.config.get('destination', 'IST')
-        
-        url = f"https://www.turkishairlines.com/tr-tr/ucak-bileti/arama/?adultCount=1&childCount=0&infantCount=0&departDate={formatted_date}&arrivalDate=&tripType=O&originCode={origin}&destinationCode={dest}"
-        return url
+    def get_booking_url(self, date, watch=None):
+        """Generate Turkish Airlines booking URL (for a watchlist entry when given)"""
+        if watch is None:
+            return booking_url(self.config.get('origin', 'DIY'), self.config.get('destination', 'IST'), date)
+        return booking_url(watch.origin, watch.destination, date, watch.adults, watch.children)
     
     def check_and_notify(self):
         """Main check function - sends reminder with booking links"""
@@ -79,26 +74,28 @@ class FlightPriceMonitor:
         print("🛫 Flight Price Monitor - Status Update")
         print("=" * 60)
         print(f"Time: {now.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Route: {self.config.get('origin')} → {self.config.get('destination')}")
-        print(f"Dates: {', '.join(self.config.get('dates', []))}")
-        print(f"Threshold: {self.config.get('price_threshold')} TL")
+        for watch in self.watches:
+            print(f"Route: {watch.name}")
+            print(f"Dates: {', '.join(watch.travel_dates())}")
+            print(f"Threshold: {watch.threshold} TL")
         print("=" * 60)
         
         # Build message with booking links
         message = "🛫 <b>Flight Price Check Reminder</b>\n\n"
-        message += f"📍 Route: <b>{self.config.get('origin')} → {self.config.get('destination')}</b>\n"
-        message += f"💰 Your target: <b>{self.config.get('price_threshold')} TL</b>\n\n"
-        message += "🔗 <b>Check prices now:</b>\n\n"
-        
-        for date in self.config.get('dates', []):
-            url = self.get_booking_url(date)
-            # Format date nicely
-            if '-' in date:
-                parts = date.split('-')
-                nice_date = f"{parts[2]}.{parts[1]}.{parts[0]}"
-            else:
-                nice_date = date
-            message += f"📅 {nice_date}\n{url}\n\n"
+        for watch in self.watches:
+            message += f"📍 Route: <b>{watch.name}</b>\n"
+            message += f"💰 Your target: <b>{watch.threshold} TL</b>\n\n"
+            message += "🔗 <b>Check prices now:</b>\n\n"
+            
+            for date in watch.travel_dates():
+                url = self.get_booking_url(date, watch)
+                # Format date nicely
+                if '-' in date:
+                    parts = date.split('-')
+                    nice_date = f"{parts[2]}.{parts[1]}.{parts[0]}"
+                else:
+                    nice_date = date
+                message += f"📅 {nice_date}\n{url}\n\n"
         
         message += "━━━━━━━━━━━━━━━\n"
         message += f"⏰ Next check in {self.config.get('check_interval_minutes', 60)} minutes\n"
@@ -122,9 +119,10 @@ class FlightPriceMonitor:
         
         # Send startup message
         startup_msg = "🚀 <b>Flight Monitor Started!</b>\n\n"
-        startup_msg += f"✈️ Route: {self.config.get('origin')} → {self.config.get('destination')}\n"
-        startup_msg += f"📅 Dates: {', '.join(self.config.get('dates', []))}\n"
-        startup_msg += f"💰 Target: {self.config.get('price_threshold')} TL\n"
+        for watch in self.watches:
+            startup_msg += f"✈️ Route: {watch.name}\n"
+            startup_msg += f"📅 Dates: {', '.join(watch.travel_dates())}\n"
+            startup_msg += f"💰 Target: {watch.threshold} TL\n"
         startup_msg += f"⏰ Check interval: {check_interval} minutes\n\n"
         startup_msg += "You'll receive booking links to check prices manually.\n"
         startup_msg += "Click the links to see current prices on Turkish Airlines!"
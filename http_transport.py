@@ -0,0 +1,124 @@
+"""
+Shared HTTP transport for all outbound calls
+Pooled keep-alive sessions, timeouts and jittered exponential backoff that honors Retry-After
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Connections kept open per host; anything else uses the default pool
+DEFAULT_POOL_SIZES = {
+    'serpapi.com': 8,
+    'api.telegram.org': 4,
+    'www.turkishairlines.com': 4
+}
+
+
+def retry_after_seconds(response):
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpTransport:
+    def __init__(self, pool_sizes=None, timeout=(5, 30), retries=3, backoff=0.5, max_backoff=30):
+        """One keep-alive session with a connection pool per known host"""
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=4))
+        self.session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=4))
+        sizes = dict(DEFAULT_POOL_SIZES)
+        sizes.update(pool_sizes or {})
+        for host, size in sizes.items():
+            self.session.mount(f"https://{host}/", HTTPAdapter(pool_connections=1, pool_maxsize=size))
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def backoff_delay(self, attempt, response=None):
+        """Full-jitter exponential backoff, overridden by the server's Retry-After"""
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff * 4)
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def request(self, method, url, retries=None, **kwargs):
+        """
+        Send a request, retrying connection errors and retryable statuses
+        POSTs are only retried when the server cannot have acted on them (429, connect errors)
+        """
+        retries = self.retries if retries is None else retries
+        kwargs.setdefault('timeout', self.timeout)
+        idempotent = method.upper() in ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+        for attempt in range(retries + 1):
+            self._count('requests')
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A read timeout means the server may already have acted on the request
+                unsafe = isinstance(e, requests.ReadTimeout) and not idempotent
+                if attempt >= retries or unsafe:
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(self.backoff_delay(attempt))
+                continue
+
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUSES)
+            if not retryable or attempt >= retries:
+                return response
+            self._count('retries')
+            time.sleep(self.backoff_delay(attempt, response))
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_transport(config=None):
+    """Process-wide transport so every monitor and notifier shares one connection pool"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            config = config or {}
+            _shared = HttpTransport(
+                pool_sizes=config.get('http_pool_sizes'),
+                timeout=(config.get('http_connect_timeout', 5), config.get('http_read_timeout', 30)),
+                retries=config.get('http_retries', 3)
+            )
+        return _shared
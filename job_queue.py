@@ -0,0 +1,435 @@
+"""
+Job queue for running the monitors as stateless workers
+A coordinator enqueues one job per watched search and check interval; workers lease jobs, run the
+search and hand the prices back with the acknowledgement. A lease that is not acknowledged within the
+visibility timeout (the worker died or hung) makes the job available again, so every job is checked at
+least once. Job ids are deterministic, so enqueueing the same slot twice, a late duplicate result and
+re-processing a result after a coordinator crash never add a second check, history entry or alert.
+
+Backends: SQLite file (job_queue.db, for one machine or local testing) or Redis (pip install redis)
+
+Usage:
+  python job_queue.py coordinator [--serpapi]   enqueue searches, record results, send alerts
+  python job_queue.py worker [--serpapi]        run searches; keeps no history or alert state
+"""
+
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from watchlist import Query
+from supervisor import MONITORS
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+Job = namedtuple('Job', 'id payload token attempts')
+
+# Finished job ids are remembered this long so a restarted coordinator does not enqueue them again
+DONE_RETENTION_SECONDS = 2 * 24 * 3600
+
+
+def job_id(query, slot):
+    """Id of a search in one check-interval slot"""
+    return f"{query.route}|{query.date.strip()}|{slot}"
+
+
+class SQLiteJobQueue:
+    def __init__(self, db_file='job_queue.db', visibility_timeout=600, max_attempts=5):
+        """Open (and create if needed) the queue database"""
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'queued',
+                available_at REAL NOT NULL,
+                token TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                finished_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (state, available_at)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS results (job_id TEXT PRIMARY KEY, payload TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS alerted (job_id TEXT PRIMARY KEY, sent_at REAL NOT NULL)")
+
+    def _write(self, func):
+        """Run func(conn) in one IMMEDIATE transaction"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(self.conn)
+                self.conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, job_id, payload, delay=0):
+        """Add a job unless one with this id is queued or finished; True if it was added"""
+        row = (job_id, json.dumps(payload, ensure_ascii=False), time.time() + delay)
+        return self._write(lambda c: c.execute(
+            "INSERT OR IGNORE INTO jobs (id, payload, available_at) VALUES (?, ?, ?)", row
+        ).rowcount) == 1
+
+    def lease(self, count=1):
+        """Take up to count available jobs for visibility_timeout seconds"""
+        def take(conn):
+            now = time.time()
+            rows = conn.execute(
+                "SELECT id, payload, attempts FROM jobs WHERE state = 'queued' AND available_at <= ? "
+                "ORDER BY available_at LIMIT ?", (now, count)
+            ).fetchall()
+            leased = []
+            for key, payload, attempts in rows:
+                if attempts >= self.max_attempts:
+                    # Poison job: stop handing it out
+                    conn.execute("UPDATE jobs SET state = 'dead', finished_at = ? WHERE id = ?", (now, key))
+                    continue
+                token = uuid.uuid4().hex
+                conn.execute("UPDATE jobs SET available_at = ?, token = ?, attempts = ? WHERE id = ?",
+                             (now + self.visibility_timeout, token, attempts + 1, key))
+                leased.append(Job(key, json.loads(payload), token, attempts + 1))
+            return leased
+        return self._write(take)
+
+    def extend(self, job):
+        """Push the lease deadline out for a job that is still being worked on"""
+        return self._write(lambda c: c.execute(
+            "UPDATE jobs SET available_at = ? WHERE id = ? AND token = ? AND state = 'queued'",
+            (time.time() + self.visibility_timeout, job.id, job.token)
+        ).rowcount) == 1
+
+    def ack(self, job, result=None):
+        """Finish a leased job and store its result; False if the lease was lost to another worker"""
+        def finish(conn):
+            done = conn.execute(
+                "UPDATE jobs SET state = 'done', finished_at = ?, token = NULL "
+                "WHERE id = ? AND token = ? AND state = 'queued'", (time.time(), job.id, job.token)
+            ).rowcount
+            if done and result is not None:
+                conn.execute("INSERT OR IGNORE INTO results VALUES (?, ?)",
+                             (job.id, json.dumps(result, ensure_ascii=False)))
+            return done == 1
+        return self._write(finish)
+
+    def release(self, job, delay=0):
+        """Give a leased job back, to be retried after delay seconds"""
+        return self._write(lambda c: c.execute(
+            "UPDATE jobs SET available_at = ?, token = NULL WHERE id = ? AND token = ? AND state = 'queued'",
+            (time.time() + delay, job.id, job.token)
+        ).rowcount) == 1
+
+    def pending_results(self, limit=100):
+        """[(job_id, result)] not yet marked finished by the coordinator"""
+        with self._lock:
+            rows = self.conn.execute("SELECT job_id, payload FROM results LIMIT ?", (limit,)).fetchall()
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def finish_result(self, job_id):
+        """Drop a result once it has been recorded"""
+        self._write(lambda c: c.execute("DELETE FROM results WHERE job_id = ?", (job_id,)))
+
+    def claim_alert(self, job_id):
+        """True the first time it is called for a job, so its alert goes out once"""
+        return self._write(lambda c: c.execute(
+            "INSERT OR IGNORE INTO alerted VALUES (?, ?)", (job_id, time.time())
+        ).rowcount) == 1
+
+    def purge(self, older_than=DONE_RETENTION_SECONDS):
+        """Forget finished jobs and sent alerts older than older_than seconds"""
+        cutoff = time.time() - older_than
+
+        def purge_old(conn):
+            conn.execute("DELETE FROM jobs WHERE state != 'queued' AND finished_at < ?", (cutoff,))
+            conn.execute("DELETE FROM alerted WHERE sent_at < ?", (cutoff,))
+        self._write(purge_old)
+
+    def stats(self):
+        """{queued, leased, done, dead, results}"""
+        now = time.time()
+        with self._lock:
+            counts = dict(self.conn.execute(
+                "SELECT CASE WHEN state = 'queued' AND token IS NOT NULL AND available_at > ? THEN 'leased' "
+                "ELSE state END, COUNT(*) FROM jobs GROUP BY 1", (now,)
+            ).fetchall())
+            counts['results'] = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {state: counts.get(state, 0) for state in ('queued', 'leased', 'done', 'dead', 'results')}
+
+    def close(self):
+        self.conn.close()
+
+
+# Each script runs atomically inside Redis, which is what makes leases and acks safe between workers
+REDIS_ENQUEUE = """
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 or redis.call('ZSCORE', KEYS[5], ARGV[1])
+    or redis.call('ZSCORE', KEYS[6], ARGV[1]) then return 0 end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+REDIS_LEASE = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local leased = {}
+for i, id in ipairs(ids) do
+    local attempts = redis.call('HINCRBY', KEYS[4], id, 1)
+    if attempts > tonumber(ARGV[5]) then
+        redis.call('ZREM', KEYS[1], id)
+        redis.call('HDEL', KEYS[2], id)
+        redis.call('HDEL', KEYS[3], id)
+        redis.call('HDEL', KEYS[4], id)
+        redis.call('ZADD', KEYS[6], ARGV[1], id)
+    else
+        local token = ARGV[4] .. ':' .. i
+        redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[3]), id)
+        redis.call('HSET', KEYS[3], id, token)
+        table.insert(leased, {id, redis.call('HGET', KEYS[2], id), token, attempts})
+    end
+end
+return leased
+"""
+REDIS_ACK = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+redis.call('ZADD', KEYS[5], ARGV[3], ARGV[1])
+if ARGV[4] ~= '' then redis.call('HSETNX', KEYS[7], ARGV[1], ARGV[4]) end
+return 1
+"""
+REDIS_MOVE = """
+if redis.call('HGET', KEYS[3], ARGV[1]) ~= ARGV[2] then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+if ARGV[4] == 'release' then redis.call('HDEL', KEYS[3], ARGV[1]) end
+return 1
+"""
+
+
+class RedisJobQueue:
+    def __init__(self, url='redis://localhost:6379/0', prefix='flight_monitor:jobs', visibility_timeout=600,
+                 max_attempts=5, client=None):
+        """Same queue on Redis, shared by workers on any number of machines"""
+        if client is None:
+            if redis is None:
+                raise RuntimeError("The redis job queue needs the redis package (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        # ready (zset by available_at), payloads, tokens, attempts, done, dead, results, alerted
+        self.keys = [f"{prefix}:{name}" for name in
+                     ('ready', 'payloads', 'tokens', 'attempts', 'done', 'dead', 'results', 'alerted')]
+        self._enqueue = client.register_script(REDIS_ENQUEUE)
+        self._lease = client.register_script(REDIS_LEASE)
+        self._ack = client.register_script(REDIS_ACK)
+        self._move = client.register_script(REDIS_MOVE)
+
+    def enqueue(self, job_id, payload, delay=0):
+        return self._enqueue(keys=self.keys, args=[
+            job_id, json.dumps(payload, ensure_ascii=False), time.time() + delay
+        ]) == 1
+
+    def lease(self, count=1):
+        rows = self._lease(keys=self.keys, args=[
+            time.time(), count, self.visibility_timeout, uuid.uuid4().hex, self.max_attempts
+        ])
+        return [Job(_text(key), json.loads(payload), _text(token), int(attempts))
+                for key, payload, token, attempts in rows]
+
+    def extend(self, job):
+        return self._move(keys=self.keys, args=[
+            job.id, job.token, time.time() + self.visibility_timeout, 'extend'
+        ]) == 1
+
+    def ack(self, job, result=None):
+        encoded = '' if result is None else json.dumps(result, ensure_ascii=False)
+        return self._ack(keys=self.keys, args=[job.id, job.token, time.time(), encoded]) == 1
+
+    def release(self, job, delay=0):
+        return self._move(keys=self.keys, args=[job.id, job.token, time.time() + delay, 'release']) == 1
+
+    def pending_results(self, limit=100):
+        results = []
+        for key, payload in self.client.hscan_iter(self.keys[6], count=limit):
+            results.append((_text(key), json.loads(payload)))
+            if len(results) >= limit:
+                break
+        return results
+
+    def finish_result(self, job_id):
+        self.client.hdel(self.keys[6], job_id)
+
+    def claim_alert(self, job_id):
+        return self.client.zadd(self.keys[7], {job_id: time.time()}, nx=True) == 1
+
+    def purge(self, older_than=DONE_RETENTION_SECONDS):
+        cutoff = time.time() - older_than
+        for key in (self.keys[4], self.keys[5], self.keys[7]):
+            self.client.zremrangebyscore(key, '-inf', cutoff)
+
+    def stats(self):
+        now = time.time()
+        ready = self.client.zcard(self.keys[0])
+        leased = len([key for key in self.client.hkeys(self.keys[2])
+                      if (self.client.zscore(self.keys[0], key) or 0) > now])
+        return {
+            'queued': ready - leased,
+            'leased': leased,
+            'done': self.client.zcard(self.keys[4]),
+            'dead': self.client.zcard(self.keys[5]),
+            'results': self.client.hlen(self.keys[6])
+        }
+
+    def close(self):
+        self.client.close()
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def open_job_queue(config):
+    """Job queue selected by config['job_queue']['backend'] (sqlite or redis)"""
+    settings = config.get('job_queue', {})
+    timeout = settings.get('visibility_timeout_seconds', 600)
+    attempts = settings.get('max_attempts', 5)
+    if settings.get('backend', 'sqlite') == 'redis':
+        return RedisJobQueue(settings.get('redis_url') or 'redis://localhost:6379/0',
+                             visibility_timeout=timeout, max_attempts=attempts)
+    return SQLiteJobQueue(settings.get('file', 'job_queue.db'), visibility_timeout=timeout, max_attempts=attempts)
+
+
+def enqueue_slot(monitor, jobs, slot, interval):
+    """Queue every watched search the monitor can run for one check-interval slot; returns how many were new"""
+    added = 0
+    for query in monitor.watchlist.queries():
+        if not monitor.can_check(query):
+            continue
+        if jobs.enqueue(job_id(query, slot), {'query': list(query), 'slot_start': slot * interval}):
+            added += 1
+    return added
+
+
+def record_results(monitor, jobs, limit=100):
+    """Fold finished jobs into the history and send their alerts once; returns the number recorded"""
+    pending = jobs.pending_results(limit)
+    if not pending:
+        return 0
+
+    all_results = []
+    by_job = []
+    for key, result in pending:
+        query = Query(*result['query'])
+        if not result['prices']:
+            continue
+        # The history key comes from the stored check time, so recording a result twice writes the same entry
+        results = monitor.record_prices(query, result['prices'], datetime.fromisoformat(result['checked_at']))
+        all_results.extend(results)
+        by_job.append((key, results))
+
+    # Same order as check_and_notify: rules and analytics may promote results to alerts
+    if monitor.price_stats is not None:
+        monitor.apply_alert_rules(all_results)
+    monitor.save_price_history()
+    if all_results and monitor.config.get('analytics', {}).get('enabled', False):
+        monitor.run_price_analytics(all_results)
+
+    alerts = []
+    for key, results in by_job:
+        if any(r['alert'] for r in results) and jobs.claim_alert(key):
+            alerts.extend(r for r in results if r['alert'])
+    if alerts:
+        monitor.send_notifications(alerts)
+    for key, _ in pending:
+        jobs.finish_result(key)
+    return len(pending)
+
+
+def run_coordinator(monitor, jobs, poll_seconds=5):
+    """Enqueue each check interval's searches and record what the workers send back"""
+    interval = monitor.config.get('check_interval_minutes', 60) * 60
+    last_slot = None
+    while True:
+        slot = int(time.time() // interval)
+        if slot != last_slot:
+            added = enqueue_slot(monitor, jobs, slot, interval)
+            jobs.purge()
+            last_slot = slot
+            print(f"📥 Queued {added} searches for {datetime.fromtimestamp(slot * interval):%H:%M} "
+                  f"({jobs.stats()})")
+        recorded = record_results(monitor, jobs)
+        if recorded:
+            print(f"🧾 Recorded {recorded} results ({jobs.stats()})")
+        else:
+            time.sleep(poll_seconds)
+
+
+def run_worker(monitor, jobs, poll_seconds=5):
+    """Lease searches one at a time, run them and acknowledge them with their prices"""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"👷 Worker {worker} waiting for jobs")
+    while True:
+        leased = jobs.lease(1)
+        if not leased:
+            time.sleep(poll_seconds)
+            continue
+        job = leased[0]
+        query = Query(*job.payload['query'])
+        if not monitor.can_check(query):
+            # Queued by a coordinator of the other monitor; the browser form would return the wrong fares
+            print(f"⚠️  Job {job.id} needs another cabin or party size - use a --serpapi worker for it")
+            jobs.ack(job, {'query': list(query), 'prices': [], 'checked_at': datetime.now().isoformat(),
+                           'worker': worker})
+            continue
+        try:
+            prices = monitor.check_flight_prices(query)
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {str(e)} - retrying later")
+            jobs.release(job, delay=60 * job.attempts)
+            continue
+        if not jobs.ack(job, {'query': list(query), 'prices': prices, 'checked_at': datetime.now().isoformat(),
+                              'worker': worker}):
+            print(f"⌛ Lease on {job.id} expired before it finished; another worker has it")
+
+
+if __name__ == "__main__":
+    role = sys.argv[1] if len(sys.argv) > 1 else 'worker'
+    module = importlib.import_module(MONITORS['serpapi' if '--serpapi' in sys.argv else 'selenium'])
+    if role == 'coordinator':
+        # The coordinator owns the history, running stats and notifications
+        monitor = module.FlightPriceMonitor(overrides={'scheduler': {'enabled': False}})
+    else:
+        # Workers keep no state: nothing is saved, scheduled or sent from here
+        monitor = module.FlightPriceMonitor(overrides={
+            'scheduler': {'enabled': False},
+            'alert_rules': {'enabled': False},
+            'notification_queue': {'enabled': False},
+            'history_backend': 'json'
+        })
+    jobs = open_job_queue(monitor.config)
+    try:
+        if role == 'coordinator':
+            run_coordinator(monitor, jobs)
+        else:
+            run_worker(monitor, jobs)
+    except KeyboardInterrupt:
+        print("\n\n👋 Stopped")
+    finally:
+        if hasattr(monitor, 'close_driver_pool'):
+            monitor.close_driver_pool()
+        monitor.metrics.close()
+        jobs.close()
@@ -0,0 +1,242 @@
+"""
+Timing spans, counters and histograms for the monitors
+Exposed in Prometheus text format on a local HTTP port and written as JSON lines;
+when metrics are disabled every call goes to a no-op object
+"""
+
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds; a cycle can take minutes, an extraction milliseconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+HISTOGRAM_BUCKETS = {
+    'prices_found': COUNT_BUCKETS
+}
+NAMESPACE = 'flight_monitor'
+
+
+def escape_label(value):
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def label_text(labels):
+    """Prometheus label block for a sorted tuple of (name, value) pairs"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}'
+
+
+class Span:
+    """Times one stage; counts a failure when the block raises or fail() is called"""
+    __slots__ = ('metrics', 'stage', 'labels', 'started', 'ok', 'fields')
+
+    def __init__(self, metrics, stage, labels):
+        self.metrics = metrics
+        self.stage = stage
+        self.labels = labels
+        self.ok = True
+        self.fields = {}
+
+    def fail(self, reason=None):
+        """Mark the stage as failed without raising"""
+        self.ok = False
+        if reason:
+            self.fields['reason'] = reason
+
+    def note(self, **fields):
+        """Extra fields for the JSON log line"""
+        self.fields.update(fields)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fail(exc_type.__name__)
+        self.metrics.finish_span(self, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    """Span stand-in when metrics are disabled"""
+    __slots__ = ()
+
+    def fail(self, reason=None):
+        pass
+
+    def note(self, **fields):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class NullMetrics:
+    """Does nothing; used when metrics are disabled"""
+    enabled = False
+
+    def span(self, stage, **labels):
+        return NULL_SPAN
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+    def log(self, event, **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, json_log=None, namespace=NAMESPACE):
+        """Collect metrics in memory; json_log is a file path, '-' for stdout, or None"""
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.server = None
+        if json_log == '-':
+            self._log_file = sys.stdout
+        elif json_log:
+            self._log_file = open(json_log, 'a', encoding='utf-8')
+        else:
+            self._log_file = None
+
+    def span(self, stage, **labels):
+        """Context manager timing one stage, e.g. with metrics.span('navigate'): ..."""
+        return Span(self, stage, labels)
+
+    def finish_span(self, span, elapsed):
+        """Record a finished span"""
+        labels = dict(span.labels, stage=span.stage)
+        self.observe('stage_duration_seconds', elapsed, **labels)
+        if not span.ok:
+            self.inc('stage_failures_total', **labels)
+        self.log('span', stage=span.stage, seconds=round(elapsed, 6), ok=span.ok, **span.labels, **span.fields)
+
+    def inc(self, name, value=1, **labels):
+        """Add to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Add a sample to a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                bounds = HISTOGRAM_BUCKETS.get(name, DURATION_BUCKETS)
+                histogram = self.histograms[key] = {'bounds': bounds, 'buckets': [0] * len(bounds),
+                                                    'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(histogram['bounds']):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def log(self, event, **fields):
+        """Write one JSON log line"""
+        if self._log_file is None:
+            return
+        line = json.dumps({'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': event, **fields},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            self._log_file.write(line + '\n')
+            self._log_file.flush()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, dict(h, buckets=list(h['buckets']))) for key, h in self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            full = f"{self.namespace}_{name}"
+            if full not in typed:
+                typed.add(full)
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{label_text(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            full = f"{self.namespace}_{name}"
+            if full not in typed:
+                typed.add(full)
+                lines.append(f"# TYPE {full} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram['bounds'], histogram['buckets']):
+                cumulative += count
+                lines.append(f"{full}_bucket{label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{full}_bucket{label_text(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{full}_sum{label_text(labels)} {histogram['sum']}")
+            lines.append(f"{full}_count{label_text(labels)} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics from a background thread; returns the bound port"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address[1]
+
+    def close(self):
+        """Stop the HTTP endpoint and close the JSON log"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._log_file is not None and self._log_file is not sys.stdout:
+            self._log_file.close()
+        self._log_file = None
+
+
+def setup_metrics(config):
+    """Metrics from config['metrics'], or a NullMetrics when they are disabled"""
+    settings = config.get('metrics', {})
+    if not settings.get('enabled', False):
+        return NullMetrics()
+    metrics = Metrics(json_log=settings.get('json_log') or None)
+    port = settings.get('port', 9108)
+    if port:
+        try:
+            port = metrics.serve(int(port), settings.get('host', '127.0.0.1'))
+            print(f"📊 Metrics at http://{settings.get('host', '127.0.0.1')}:{port}/metrics")
+        except OSError as e:
+            print(f"⚠️  Metrics endpoint not started: {str(e)}")
+    return metrics
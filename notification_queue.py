@@ -0,0 +1,186 @@
+"""
+Background notification dispatch
+The monitor enqueues alerts and moves on; per-channel workers deliver them with retries,
+and undelivered alerts are kept on disk so they survive a restart
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+
+
+class NotificationQueue:
+    def __init__(self, handlers, journal_file='pending_alerts.json', max_size=100, max_attempts=5,
+                 backoff=5, max_backoff=300):
+        """
+        handlers maps a channel name to a callable(payload) that returns True once delivered, or a
+        Future resolving to that when delivery completes later (an email digest); the alert stays
+        journaled until then. Each channel gets its own bounded queue and worker thread
+        """
+        self.handlers = handlers
+        self.journal_file = journal_file
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.pending = {}
+        # Ids sitting in a channel queue, being handled, or waiting on a Future
+        self.in_flight = set()
+        self.queues = {channel: queue.Queue(maxsize=max_size) for channel in handlers}
+        self.stats = {'enqueued': 0, 'delivered': 0, 'retries': 0, 'dropped': 0, 'restored': 0}
+        self.workers = []
+
+        if journal_file and os.path.exists(journal_file):
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                self.pending = json.load(f)
+
+    def start(self):
+        """Re-queue alerts left over from a previous run, then start one worker per channel"""
+        # Restored before any worker runs, so an idle worker's re-feed cannot queue them a second time
+        restored = list(self.pending.values())
+        for item in restored:
+            if item['channel'] in self.queues:
+                self.in_flight.add(item['id'])
+                self._put(item)
+        if restored:
+            self.stats['restored'] += len(restored)
+            print(f"📬 Restored {len(restored)} undelivered notifications")
+        for channel in self.handlers:
+            worker = threading.Thread(target=self._work, args=(channel,), name=f"notify-{channel}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def _save(self):
+        """Rewrite the journal of undelivered alerts (caller holds the lock)"""
+        if not self.journal_file:
+            return
+        tmp_file = self.journal_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.pending, f, ensure_ascii=False)
+        os.replace(tmp_file, self.journal_file)
+
+    def _put(self, item):
+        """Hand an item that is already marked in flight to its channel worker"""
+        try:
+            self.queues[item['channel']].put_nowait(item)
+            return True
+        except queue.Full:
+            # Still journaled; the worker picks it up again once its queue drains
+            with self._lock:
+                self.in_flight.discard(item['id'])
+            print(f"⚠️  {item['channel']} notification queue is full - alert kept on disk")
+            return False
+
+    def _refeed(self, channel):
+        """Queue journaled alerts of a channel that are not in flight: overflow and retries that came due"""
+        now = time.time()
+        with self._lock:
+            waiting = [item for item in self.pending.values()
+                       if item['channel'] == channel and item['id'] not in self.in_flight
+                       and item.get('retry_at', 0) <= now]
+        for item in waiting:
+            with self._lock:
+                if item['id'] in self.in_flight or item['id'] not in self.pending:
+                    continue
+                self.in_flight.add(item['id'])
+            if not self._put(item):
+                break
+
+    def enqueue(self, channel, payload):
+        """Persist an alert and hand it to the channel's worker; never blocks on delivery"""
+        if channel not in self.handlers:
+            raise ValueError(f"Unknown notification channel: {channel}")
+        item = {'id': uuid.uuid4().hex, 'channel': channel, 'payload': payload, 'attempts': 0,
+                'created_at': time.time()}
+        with self._lock:
+            self.pending[item['id']] = item
+            # In flight from the moment it is journaled, so _refeed never queues it as well
+            self.in_flight.add(item['id'])
+            self._save()
+            self.stats['enqueued'] += 1
+        self._put(item)
+        return item['id']
+
+    def _finish(self, item, delivered):
+        with self._lock:
+            self.pending.pop(item['id'], None)
+            self.in_flight.discard(item['id'])
+            self._save()
+            self.stats['delivered' if delivered else 'dropped'] += 1
+
+    def _retry_delay(self, item):
+        return random.uniform(0.5, 1.0) * min(self.max_backoff, self.backoff * 2 ** (item['attempts'] - 1))
+
+    def _settle(self, item, receipt):
+        """Finish or reschedule an alert whose delivery completed after its handler returned"""
+        if receipt.result() is True:
+            self._finish(item, True)
+        elif item['attempts'] >= self.max_attempts:
+            print(f"❌ Giving up on {item['channel']} notification after {item['attempts']} attempts")
+            self._finish(item, False)
+        else:
+            with self._lock:
+                item['retry_at'] = time.time() + self._retry_delay(item)
+                self.in_flight.discard(item['id'])
+                self.stats['retries'] += 1
+                self._save()
+
+    def _work(self, channel):
+        handler = self.handlers[channel]
+        while not self._stopping.is_set():
+            try:
+                item = self.queues[channel].get(timeout=1)
+            except queue.Empty:
+                self._refeed(channel)
+                continue
+            while not self._stopping.is_set():
+                item['attempts'] += 1
+                try:
+                    delivered = handler(item['payload'])
+                except Exception as e:
+                    print(f"❌ {channel} delivery error: {str(e)}")
+                    delivered = False
+                if hasattr(delivered, 'add_done_callback'):
+                    # Accepted but not sent yet: keep it journaled and in flight until the Future resolves
+                    with self._lock:
+                        self._save()
+                    delivered.add_done_callback(lambda receipt, item=item: self._settle(item, receipt))
+                    break
+                if delivered:
+                    self._finish(item, True)
+                    break
+                if item['attempts'] >= self.max_attempts:
+                    print(f"❌ Giving up on {channel} notification after {item['attempts']} attempts")
+                    self._finish(item, False)
+                    break
+                with self._lock:
+                    self.stats['retries'] += 1
+                    self._save()
+                self._stopping.wait(self._retry_delay(item))
+            self.queues[channel].task_done()
+
+    def backlog(self):
+        """Number of alerts not yet delivered"""
+        with self._lock:
+            return len(self.pending)
+
+    def join(self, timeout=None):
+        """Wait until every queued alert was delivered or given up (True), or timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.backlog():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self, timeout=5):
+        """Give workers a moment to drain, then stop; whatever is left stays journaled"""
+        self.join(timeout)
+        self._stopping.set()
+        for worker in self.workers:
+            worker.join(timeout=2)
@@ -0,0 +1,151 @@
+"""
+Compact in-memory representation of price observations
+Stores history as parallel typed arrays instead of one dict per price
+"""
+
+from array import array
+from datetime import datetime
+
+
+def format_try(price):
+    """Format a price the way Turkish Airlines shows it, e.g. 1.850,50 TL"""
+    whole, cents = divmod(round(price * 100), 100)
+    text = f"{int(whole):,}".replace(',', '.')
+    if cents:
+        text += f",{int(cents):02d}"
+    return f"{text} TL"
+
+
+def to_epoch(timestamp):
+    """ISO timestamp from price_history.json to integer seconds"""
+    return int(datetime.fromisoformat(timestamp).timestamp())
+
+
+class StringTable:
+    """Interns repeated strings (dates, airlines, times) as small integer codes"""
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = ['']
+        self.codes = {'': 0}
+
+    def code(self, value):
+        value = value or ''
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+
+class Observation:
+    """A single price sighting; a lightweight view built on demand from PriceColumns"""
+    __slots__ = ('travel_date', 'observed_at', 'price', 'airline', 'departure_time', 'arrival_time', 'duration')
+
+    def __init__(self, travel_date, observed_at, price, airline='', departure_time='', arrival_time='', duration=''):
+        self.travel_date = travel_date
+        self.observed_at = observed_at
+        self.price = price
+        self.airline = airline
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+        self.duration = duration
+
+    def to_dict(self):
+        """Rebuild the price dict shape the monitors use"""
+        result = {'price': self.price, 'text': format_try(self.price), 'date': self.travel_date}
+        if self.airline:
+            result.update({
+                'airline': self.airline,
+                'departure_time': self.departure_time,
+                'arrival_time': self.arrival_time,
+                'duration': self.duration
+            })
+        return result
+
+    def __repr__(self):
+        return f"Observation({self.travel_date!r}, {self.observed_at}, {self.price})"
+
+
+class PriceColumns:
+    def __init__(self):
+        """Empty columnar history: one slot per observed price"""
+        self.prices = array('d')
+        self.observed_at = array('q')
+        self.date_codes = array('I')
+        self.airline_codes = array('I')
+        self.departure_codes = array('I')
+        self.arrival_codes = array('I')
+        self.duration_codes = array('I')
+        self.dates = StringTable()
+        self.strings = StringTable()
+
+    def append(self, travel_date, observed_at, price, airline='', departure_time='', arrival_time='', duration=''):
+        """Add one observation; observed_at is epoch seconds"""
+        self.prices.append(float(price))
+        self.observed_at.append(int(observed_at))
+        self.date_codes.append(self.dates.code(travel_date.strip()))
+        self.airline_codes.append(self.strings.code(airline))
+        self.departure_codes.append(self.strings.code(departure_time))
+        self.arrival_codes.append(self.strings.code(arrival_time))
+        self.duration_codes.append(self.strings.code(str(duration) if duration else ''))
+
+    def add_entry(self, entry):
+        """Add every price of one price_history entry (Selenium or SerpApi shape)"""
+        observed_at = to_epoch(entry['timestamp'])
+        for p in entry.get('prices', entry.get('flights', [])):
+            if p.get('price') is None:
+                continue
+            self.append(
+                entry['date'], observed_at, p['price'],
+                p.get('airline', ''), p.get('departure_time', ''), p.get('arrival_time', ''), p.get('duration', '')
+            )
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build from (key, entry) pairs, e.g. a history store's iter_entries()"""
+        columns = cls()
+        for _, entry in entries:
+            columns.add_entry(entry)
+        return columns
+
+    @classmethod
+    def from_history(cls, history):
+        """Convert the price_history.json dict shape"""
+        return cls.from_entries(history.items())
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __getitem__(self, i):
+        return Observation(
+            self.dates[self.date_codes[i]], self.observed_at[i], self.prices[i],
+            self.strings[self.airline_codes[i]], self.strings[self.departure_codes[i]],
+            self.strings[self.arrival_codes[i]], self.strings[self.duration_codes[i]]
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def travel_dates(self):
+        """All distinct travel dates seen"""
+        return self.dates.values[1:]
+
+    def min_price(self, travel_date):
+        """Lowest observed price for a travel date, or None"""
+        code = self.dates.codes.get(travel_date.strip())
+        if code is None:
+            return None
+        prices = [p for p, c in zip(self.prices, self.date_codes) if c == code]
+        return min(prices) if prices else None
+
+    def nbytes(self):
+        """Approximate bytes held by the numeric columns"""
+        columns = (self.prices, self.observed_at, self.date_codes, self.airline_codes,
+                   self.departure_codes, self.arrival_codes, self.duration_codes)
+        return sum(col.itemsize * len(col) for col in columns)
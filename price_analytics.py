@@ -0,0 +1,114 @@
+"""
+Vectorized price analytics over the columnar history
+Rolling minima/medians, change versus baseline, fare gaps and new-low flags per travel date
+"""
+
+from price_stats import promote_result
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def analytics_available():
+    """NumPy is optional; analytics are skipped without it"""
+    return np is not None
+
+
+def _group_starts(keys):
+    """Indices where a new run of equal keys begins in a sorted array"""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def _window_starts(check_key, check_dates, check_times, rows, span, max_rows):
+    """
+    First index of the rolling window ending at each of `rows`: same date, within the last
+    `span` seconds and at most max_rows checks; check_key must be sorted
+    """
+    in_span = np.searchsorted(check_key, check_dates[rows].astype(np.int64) * (1 << 40) + check_times[rows] - span,
+                              side='right')
+    return np.maximum(in_span, rows - max_rows + 1)
+
+
+def compute_price_stats(columns, window_days=7, max_checks=256):
+    """
+    Per-date statistics from a PriceColumns history, computed in one vectorized pass
+    Rolling figures cover the last window_days (at most max_checks checks)
+    Returns {travel_date: {...}} describing the most recent check of each date
+    """
+    if np is None or len(columns) == 0:
+        return {}
+
+    prices = np.frombuffer(columns.prices, dtype=np.float64)
+    observed = np.frombuffer(columns.observed_at, dtype=np.int64)
+    dates = np.frombuffer(columns.date_codes, dtype=np.uint32)
+
+    # Sort by price inside each (date, check) so the first two rows are the two cheapest fares
+    order = np.lexsort((prices, observed, dates))
+    prices, observed, dates = prices[order], observed[order], dates[order]
+
+    # Collapse to one row per check: cheapest fare and gap to the next fare
+    check_key = dates.astype(np.int64) * (1 << 40) + observed
+    starts = _group_starts(check_key)
+    ends = np.r_[starts[1:], len(prices)]
+    check_min = prices[starts]
+    second = np.where(ends - starts > 1, prices[np.minimum(starts + 1, len(prices) - 1)], np.nan)
+    fare_gap = second - check_min
+    check_dates = dates[starts]
+    check_times = observed[starts]
+    check_key = check_key[starts]
+    span = window_days * 86400
+
+    # Only the latest check of each date is reported, so windows are bounded for those rows alone
+    date_starts = _group_starts(check_dates)
+    date_ends = np.r_[date_starts[1:], len(check_min)] - 1
+    window_starts = np.maximum(_window_starts(check_key, check_dates, check_times, date_ends, span, max_checks),
+                               date_starts)
+    # Baseline window: the earlier checks only, so it may reach one check further back
+    baseline_starts = np.maximum(
+        _window_starts(check_key, check_dates, check_times, date_ends, span, max_checks + 1), date_starts
+    )
+    all_time_low = np.minimum.reduceat(check_min, date_starts)
+
+    stats = {}
+    for start, last, window_start, baseline_start, low in zip(date_starts, date_ends, window_starts,
+                                                               baseline_starts, all_time_low):
+        travel_date = columns.dates[int(check_dates[last])]
+        latest = float(check_min[last])
+        window = check_min[window_start:last + 1]
+        earlier = check_min[baseline_start:last]
+        baseline = float(np.median(earlier)) if len(earlier) else None
+        stats[travel_date] = {
+            'latest': latest,
+            'checks': int(last - start + 1),
+            'window_days': window_days,
+            'rolling_min': float(window.min()),
+            'rolling_median': float(np.median(window)),
+            'baseline': baseline,
+            'pct_change': (latest - baseline) / baseline * 100 if baseline else None,
+            'fare_gap': None if np.isnan(fare_gap[last]) else float(fare_gap[last]),
+            'all_time_low': float(low),
+            'new_low': bool(last > start and latest < check_min[start:last].min())
+        }
+    return stats
+
+
+def apply_price_analytics(results, stats, drop_percent=15):
+    """
+    Promote cycle results to alerts when analytics spot a new low or a sharp drop
+    results is the all_results list built by check_and_notify
+    """
+    for result in results:
+        info = stats.get(result['date'].strip())
+        if not info:
+            continue
+        result['analytics'] = info
+        reasons = []
+        if info['new_low']:
+            reasons.append("new all-time low")
+        if info['pct_change'] is not None and info['pct_change'] <= -drop_percent:
+            reasons.append(f"{-info['pct_change']:.0f}% below the {info['window_days']}-day median "
+                           f"of {info['baseline']:.0f} TL")
+        promote_result(result, reasons)
+    return results
@@ -0,0 +1,115 @@
+"""
+Incremental per-(route, date) price statistics
+Each new observation updates running accumulators in O(1), so alert rules never rescan history
+"""
+
+import json
+import os
+from collections import deque
+from datetime import datetime
+from price_store import entry_min_price
+
+
+def promote_result(result, reasons):
+    """Turn a check_and_notify result into an alert and record why"""
+    if not reasons:
+        return
+    if not result.get('alert'):
+        prices = result.get('prices', [])
+        result['alert'] = True
+        result['low_prices'] = [min(prices, key=lambda p: p['price'])] if prices else []
+    if result.get('reason'):
+        reasons = [result['reason']] + [r for r in reasons if r not in result['reason']]
+    result['reason'] = ', '.join(reasons)
+
+
+class RunningStats:
+    """Accumulators for one (route, travel date)"""
+    __slots__ = ('count', 'min', 'ewma', 'window')
+
+    def __init__(self, count=0, min=None, ewma=None, window=None):
+        self.count = count
+        self.min = min
+        self.ewma = ewma
+        # Monotonic deque of (timestamp, price): prices increase from left to right
+        self.window = deque(window or [])
+
+    def window_min(self, now, window_seconds):
+        """Lowest price observed within the window ending at now"""
+        while self.window and self.window[0][0] <= now - window_seconds:
+            self.window.popleft()
+        return self.window[0][1] if self.window else None
+
+    def update(self, now, price, alpha, window_seconds):
+        """Fold in one observation; returns the state before it"""
+        before = {
+            'count': self.count,
+            'min': self.min,
+            'ewma': self.ewma,
+            'window_min': self.window_min(now, window_seconds)
+        }
+        self.count += 1
+        self.min = price if self.min is None else min(self.min, price)
+        self.ewma = price if self.ewma is None else alpha * price + (1 - alpha) * self.ewma
+        while self.window and self.window[-1][1] >= price:
+            self.window.pop()
+        self.window.append((now, price))
+        return before
+
+    def to_dict(self):
+        return {'count': self.count, 'min': self.min, 'ewma': self.ewma, 'window': [list(w) for w in self.window]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['count'], data['min'], data['ewma'], [tuple(w) for w in data['window']])
+
+
+class PriceStatsBook:
+    def __init__(self, stats_file='price_stats.json', window_days=14, ewma_alpha=0.3, ewma_drop_percent=15):
+        """Load persisted accumulators; rule parameters come from config['alert_rules']"""
+        self.stats_file = stats_file
+        self.window_seconds = window_days * 86400
+        self.window_days = window_days
+        self.alpha = ewma_alpha
+        self.drop_percent = ewma_drop_percent
+        self.stats = {}
+        self.loaded = False
+        if stats_file and os.path.exists(stats_file):
+            with open(stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.stats = {key: RunningStats.from_dict(value) for key, value in data.items()}
+            self.loaded = True
+
+    def observe(self, route, travel_date, now, price):
+        """Update the (route, date) accumulators and return the alert reasons this price triggers"""
+        key = f"{route}|{travel_date.strip()}"
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = RunningStats()
+        before = stats.update(now, price, self.alpha, self.window_seconds)
+
+        reasons = []
+        if before['window_min'] is not None and price < before['window_min']:
+            reasons.append(f"lowest in {self.window_days} days")
+        if before['ewma'] and price <= before['ewma'] * (1 - self.drop_percent / 100):
+            drop = (1 - price / before['ewma']) * 100
+            reasons.append(f"{drop:.0f}% below the average of {before['ewma']:.0f} TL")
+        return reasons
+
+    def rebuild(self, route, entries):
+        """Replay (key, entry) history once when no persisted stats exist"""
+        rows = []
+        for _, entry in entries:
+            price = entry_min_price(entry)
+            if price is not None:
+                rows.append((int(datetime.fromisoformat(entry['timestamp']).timestamp()), entry['date'], price))
+        for now, travel_date, price in sorted(rows):
+            self.observe(route, travel_date, now, price)
+        return len(rows)
+
+    def save(self):
+        """Write accumulators through a temp file and atomic rename"""
+        tmp_file = self.stats_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({key: value.to_dict() for key, value in self.stats.items()}, f)
+        os.replace(tmp_file, self.stats_file)
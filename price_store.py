@@ -0,0 +1,380 @@
+"""
+Price history storage backends
+Appends each cycle's observations instead of rewriting the whole history file
+"""
+
+import bisect
+import gzip
+import json
+import os
+import sqlite3
+import threading
+
+# Rows fetched per round trip when streaming entries out of SQLite
+ITER_BATCH_ROWS = 500
+
+
+def route_key(origin, destination, cabin='economy', adults=1, children=0):
+    """Route key used to index observations, e.g. DIY-IST or DIY-IST/business/2A1C"""
+    key = f"{origin}-{destination}"
+    if cabin != 'economy' or adults != 1 or children != 0:
+        key += f"/{cabin}/{adults}A{children}C"
+    return key
+
+
+def history_route(config):
+    """Route key of the classic single origin/destination config"""
+    return route_key(config.get('origin', 'DIY'), config.get('destination', 'IST'))
+
+
+def entry_min_price(entry):
+    """Cheapest price recorded in a history entry"""
+    if entry.get('min_price') is not None:
+        return entry['min_price']
+    prices = [p['price'] for p in entry.get('prices', entry.get('flights', [])) if p.get('price') is not None]
+    return min(prices) if prices else None
+
+
+def entries_by_route(history, default_route):
+    """Split a price_history.json dict into {route: {key: entry}} by each entry's own route"""
+    by_route = {}
+    for key, entry in history.items():
+        by_route.setdefault(entry.get('route', default_route), {})[key] = entry
+    return by_route
+
+
+class SQLitePriceStore:
+    def __init__(self, db_file='price_history.db'):
+        """Open (and create if needed) the SQLite history database"""
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS observations (
+                route TEXT NOT NULL,
+                key TEXT NOT NULL,
+                travel_date TEXT NOT NULL,
+                observed_at TEXT NOT NULL,
+                min_price REAL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (route, key)
+            )
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_observations_route_date_time
+            ON observations (route, travel_date, observed_at)
+        """)
+        self.conn.commit()
+
+    def append_many(self, route, entries):
+        """Store {history_key: entry} pairs; re-appending a key is a no-op"""
+        rows = [
+            (route, key, entry['date'].strip(), entry['timestamp'], entry_min_price(entry),
+             json.dumps(entry, ensure_ascii=False))
+            for key, entry in entries.items()
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO observations VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+        return cursor.rowcount
+
+    def append(self, route, key, entry):
+        """Store a single history entry"""
+        return self.append_many(route, {key: entry})
+
+    def _where(self, route, travel_date, since, until):
+        clauses = ["route = ?"]
+        params = [route]
+        if travel_date is not None:
+            clauses.append("travel_date = ?")
+            params.append(travel_date.strip())
+        if since is not None:
+            clauses.append("observed_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("observed_at < ?")
+            params.append(until)
+        return " AND ".join(clauses), params
+
+    def min_price(self, route, travel_date, since=None, until=None):
+        """Lowest price seen for a travel date within [since, until)"""
+        where, params = self._where(route, travel_date, since, until)
+        with self._lock:
+            row = self.conn.execute(f"SELECT MIN(min_price) FROM observations WHERE {where}", params).fetchone()
+        return row[0]
+
+    def min_prices(self, pairs, since=None, until=None):
+        """{(route, travel_date): lowest price} for several dates; each is one indexed lookup"""
+        return {(route, date): self.min_price(route, date, since, until) for route, date in pairs}
+
+    def iter_entries(self, route, travel_date=None, since=None, until=None):
+        """Yield (key, entry) in observation order without loading everything at once"""
+        where, params = self._where(route, travel_date, since, until)
+        with self._lock:
+            cursor = self.conn.execute(
+                f"SELECT key, payload FROM observations WHERE {where} ORDER BY observed_at", params
+            )
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(ITER_BATCH_ROWS)
+            if not rows:
+                break
+            for key, payload in rows:
+                yield key, json.loads(payload)
+
+    def count(self, route=None):
+        """Number of stored entries"""
+        with self._lock:
+            if route is None:
+                return self.conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM observations WHERE route = ?", (route,)).fetchone()[0]
+
+    def has_route(self, route):
+        """True once any entry for route has been stored"""
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM observations WHERE route = ? LIMIT 1", (route,)).fetchone() is not None
+
+    def import_json(self, route, history_file='price_history.json'):
+        """One-time migration of an existing price_history.json; entries without a route go under route"""
+        if not os.path.exists(history_file):
+            return 0
+        with open(history_file, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        imported = 0
+        for entry_route, entries in entries_by_route(history, route).items():
+            if entry_route == route or not self.has_route(entry_route):
+                imported += self.append_many(entry_route, entries)
+        return imported
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.conn.close()
+
+
+class SuffixLows:
+    """Observations of one (route, travel date) that no later observation undercuts; prices rise with time"""
+    __slots__ = ('times', 'prices')
+
+    def __init__(self):
+        self.times = []
+        self.prices = []
+
+    def add(self, stamp, price):
+        """Record an observation (in any order); dominated ones are dropped"""
+        i = bisect.bisect_right(self.times, stamp)
+        if i < len(self.prices) and self.prices[i] <= price:
+            return
+        j = i
+        while j > 0 and self.prices[j - 1] >= price:
+            j -= 1
+        self.times[j:i] = [stamp]
+        self.prices[j:i] = [price]
+
+    def lowest_since(self, since=None):
+        """Lowest price observed at or after since"""
+        i = 0 if since is None else bisect.bisect_left(self.times, since)
+        return self.prices[i] if i < len(self.prices) else None
+
+
+class JsonlPriceStore:
+    def __init__(self, log_file='price_history.jsonl', snapshot_file='price_history.snapshot.jsonl.gz',
+                 compact_bytes=5 * 1024 * 1024):
+        """Append-only JSON-lines log plus a gzip snapshot produced by compaction"""
+        self.log_file = log_file
+        self.snapshot_file = snapshot_file
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        # {(route, travel_date): SuffixLows}, read from disk once and then kept current by appends
+        self._lows = None
+        self._routes = set()
+
+    def _index(self, route, entry, lows):
+        price = entry_min_price(entry)
+        if price is not None:
+            key = (route, entry['date'].strip())
+            if key not in lows:
+                lows[key] = SuffixLows()
+            lows[key].add(entry['timestamp'], price)
+        self._routes.add(route)
+
+    def _ensure_index(self):
+        """Build the lows index with one pass over the files on first use"""
+        with self._lock:
+            if self._lows is None:
+                lows = {}
+                for route, _, entry in self._iter_all():
+                    self._index(route, entry, lows)
+                self._lows = lows
+
+    def append_many(self, route, entries):
+        """Append one cycle's entries as a single fsynced line"""
+        if not entries:
+            return 0
+        line = (json.dumps({'route': route, 'entries': entries}, ensure_ascii=False) + '\n').encode('utf-8')
+        with self._lock:
+            with open(self.log_file, 'a+b') as f:
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        # Terminate a torn line left by a crash so this record stays readable
+                        line = b'\n' + line
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._lows is not None:
+                for entry in entries.values():
+                    self._index(route, entry, self._lows)
+        if self.compact_bytes and os.path.getsize(self.log_file) >= self.compact_bytes:
+            self.compact()
+        return len(entries)
+
+    def append(self, route, key, entry):
+        """Store a single history entry"""
+        return self.append_many(route, {key: entry})
+
+    def _iter_snapshot(self):
+        if not os.path.exists(self.snapshot_file):
+            return
+        with gzip.open(self.snapshot_file, 'rt', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                yield record['route'], record['key'], record['entry']
+
+    def _iter_log(self):
+        if not os.path.exists(self.log_file):
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-append is skipped
+                    continue
+                for key, entry in record['entries'].items():
+                    yield record['route'], key, entry
+
+    def _iter_all(self):
+        """Snapshot first, then the log tail; later duplicates of a key are dropped"""
+        seen = set()
+        for source in (self._iter_snapshot(), self._iter_log()):
+            for route, key, entry in source:
+                if (route, key) in seen:
+                    continue
+                seen.add((route, key))
+                yield route, key, entry
+
+    def iter_entries(self, route, travel_date=None, since=None, until=None):
+        """Yield (key, entry) matching the filters, streaming from disk"""
+        if travel_date is not None:
+            travel_date = travel_date.strip()
+        for entry_route, key, entry in self._iter_all():
+            if entry_route != route:
+                continue
+            if travel_date is not None and entry['date'].strip() != travel_date:
+                continue
+            if since is not None and entry['timestamp'] < since:
+                continue
+            if until is not None and entry['timestamp'] >= until:
+                continue
+            yield key, entry
+
+    def min_price(self, route, travel_date, since=None, until=None):
+        """Lowest price seen for a travel date within [since, until)"""
+        prices = [entry_min_price(entry) for _, entry in self.iter_entries(route, travel_date, since, until)]
+        prices = [p for p in prices if p is not None]
+        return min(prices) if prices else None
+
+    def min_prices(self, pairs, since=None, until=None):
+        """
+        {(route, travel_date): lowest price} for several dates; open-ended windows come from the
+        in-memory lows index, a window with an end needs a pass over the files
+        """
+        if until is None:
+            self._ensure_index()
+            with self._lock:
+                empty = SuffixLows()
+                return {(route, date): self._lows.get((route, date.strip()), empty).lowest_since(since)
+                        for route, date in pairs}
+        wanted = {(route, date.strip()): (route, date) for route, date in pairs}
+        lows = dict.fromkeys(wanted.values())
+        for route, _, entry in self._iter_all():
+            pair = wanted.get((route, entry['date'].strip()))
+            if pair is None:
+                continue
+            if since is not None and entry['timestamp'] < since:
+                continue
+            if until is not None and entry['timestamp'] >= until:
+                continue
+            price = entry_min_price(entry)
+            if price is not None and (lows[pair] is None or price < lows[pair]):
+                lows[pair] = price
+        return lows
+
+    def count(self, route=None):
+        """Number of stored entries (reads every file; not meant for the per-cycle path)"""
+        return sum(1 for entry_route, _, _ in self._iter_all() if route is None or entry_route == route)
+
+    def has_route(self, route):
+        """True once any entry for route has been stored"""
+        self._ensure_index()
+        with self._lock:
+            return route in self._routes
+
+    def import_json(self, route, history_file='price_history.json'):
+        """One-time migration of an existing price_history.json; entries without a route go under route"""
+        if not os.path.exists(history_file):
+            return 0
+        with open(history_file, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+        imported = 0
+        for entry_route, entries in entries_by_route(history, route).items():
+            if entry_route == route or not self.has_route(entry_route):
+                imported += self.append_many(entry_route, entries)
+        return imported
+
+    def compact(self):
+        """Fold the log into a new snapshot via temp file + atomic rename, then empty the log"""
+        with self._lock:
+            tmp_file = self.snapshot_file + '.tmp'
+            lows = {}
+            with open(tmp_file, 'wb') as raw:
+                with gzip.open(raw, 'wt', encoding='utf-8') as f:
+                    for route, key, entry in self._iter_all():
+                        f.write(json.dumps({'route': route, 'key': key, 'entry': entry}, ensure_ascii=False) + '\n')
+                        self._index(route, entry, lows)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+            self._lows = lows
+            # If we crash before truncating, replaying the log again is harmless: keys are deduplicated
+            with open(self.log_file, 'w', encoding='utf-8') as f:
+                f.flush()
+                os.fsync(f.fileno())
+        print(f"🗜️  Compacted price history into {self.snapshot_file}")
+
+    def close(self):
+        """Nothing to release; files are opened per operation"""
+        pass
+
+
+def open_price_store(config):
+    """Build the history backend selected by config['history_backend'], or None for plain JSON"""
+    backend = config.get('history_backend', 'json')
+    if backend == 'sqlite':
+        return SQLitePriceStore(config.get('history_db_file', 'price_history.db'))
+    if backend == 'jsonl':
+        return JsonlPriceStore(
+            config.get('history_log_file', 'price_history.jsonl'),
+            config.get('history_snapshot_file', 'price_history.snapshot.jsonl.gz'),
+            config.get('history_compact_bytes', 5 * 1024 * 1024)
+        )
+    if backend != 'json':
+        print(f"⚠️  Unknown history backend '{backend}', using price_history.json")
+    return None
@@ -0,0 +1,167 @@
+"""
+One-cycle profiler for the monitors (python flight_monitor.py --profile-cycle [prefix])
+Runs a single check_and_notify under cProfile and tracemalloc while a sampler thread records
+stacks, then writes:
+  prefix.txt        sorted cProfile report, top allocations and where the wall time went
+  prefix.collapsed  folded stacks for flamegraph.pl / speedscope / inferno
+  prefix.prof       raw cProfile stats for snakeviz or pstats
+"""
+
+import cProfile
+import io
+import linecache
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+SAMPLE_INTERVAL = 0.005
+
+# Where a sampled stack is spending its time, checked in this order
+WEBDRIVER_PATHS = (os.sep + 'selenium' + os.sep,)
+NETWORK_PATHS = tuple(os.sep + name for name in (
+    'requests' + os.sep, 'urllib3' + os.sep, 'http' + os.sep + 'client.py', 'socket.py', 'ssl.py', 'smtplib.py'
+))
+IDLE_PATHS = tuple(os.sep + name for name in ('threading.py', 'queue.py', 'selectors.py', 'concurrent' + os.sep))
+CATEGORIES = ('python', 'webdriver', 'network', 'sleep')
+# The profiler's own allocations (line cache for the sampler, import machinery) are left out of the report
+ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')
+)
+
+
+def frame_label(code):
+    """module:function label used in the folded stacks"""
+    return f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}"
+
+
+def classify(frames):
+    """Category of one sampled stack (outermost frame first), or None for an idle thread"""
+    filenames = [frame.f_code.co_filename for frame in frames]
+    if any(path in name for name in filenames for path in WEBDRIVER_PATHS):
+        return 'webdriver'
+    if any(path in name for name in filenames for path in NETWORK_PATHS):
+        return 'network'
+    innermost = frames[-1]
+    if 'sleep(' in linecache.getline(innermost.f_code.co_filename, innermost.f_lineno):
+        return 'sleep'
+    if any(path in filenames[-1] for path in IDLE_PATHS):
+        return None
+    return 'python'
+
+
+class StackSampler:
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        """Sample the stacks of every other thread at a fixed interval"""
+        self.interval = interval
+        self.stacks = Counter()
+        self.categories = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+                frames.reverse()
+                category = classify(frames)
+                if category is None:
+                    continue
+                self.categories[category] += 1
+                stack = ';'.join(frame_label(f.f_code) for f in frames)
+                if category == 'sleep':
+                    # time.sleep is C code, so it has no frame of its own
+                    stack += ';time:sleep'
+                self.stacks[stack] += 1
+
+    def write_collapsed(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_cycle(run_cycle, prefix='profile_cycle', top=40):
+    """Run one cycle under the profilers and write the reports; returns the report text"""
+    print(f"🔬 Profiling one check cycle (reports go to {prefix}.*)")
+    tracemalloc.start(10)
+    before = tracemalloc.take_snapshot()
+    sampler = StackSampler()
+    profiler = cProfile.Profile()
+    sampler.start()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    profiler.enable()
+    try:
+        run_cycle()
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        sampler.stop()
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    profiler.dump_stats(f"{prefix}.prof")
+    sampler.write_collapsed(f"{prefix}.collapsed")
+
+    report = io.StringIO()
+    report.write(f"Cycle wall time {wall:.2f}s, process CPU {cpu:.2f}s\n")
+    report.write(f"Python heap: peak {peak / 1024 / 1024:.1f} MiB, {current / 1024 / 1024:.1f} MiB still allocated\n\n")
+
+    samples = sum(sampler.categories.values())
+    report.write(f"Where the time went ({samples} stack samples every {SAMPLE_INTERVAL * 1000:.0f}ms, busy threads only):\n")
+    for category in CATEGORIES:
+        count = sampler.categories.get(category, 0)
+        share = count / samples if samples else 0
+        report.write(f"  {category:<10} {share:6.1%}  ~{count * SAMPLE_INTERVAL:.2f}s\n")
+
+    report.write("\nLargest allocations made during the cycle:\n")
+    after = after.filter_traces(ALLOCATION_FILTERS)
+    for stat in after.compare_to(before.filter_traces(ALLOCATION_FILTERS), 'lineno')[:15]:
+        report.write(f"  {stat}\n")
+
+    report.write(f"\nTop {top} functions by cumulative time:\n")
+    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+    report.write(f"Top {top} functions by own time:\n")
+    pstats.Stats(profiler, stream=report).sort_stats('tottime').print_stats(top)
+
+    text = report.getvalue()
+    with open(f"{prefix}.txt", 'w', encoding='utf-8') as f:
+        f.write(text)
+
+    print(f"\n🔬 Cycle took {wall:.2f}s ({cpu:.2f}s CPU), peak heap {peak / 1024 / 1024:.1f} MiB")
+    for category in CATEGORIES:
+        count = sampler.categories.get(category, 0)
+        if count:
+            print(f"   {category}: {count / samples:.0%}")
+    print(f"📄 {prefix}.txt, {prefix}.collapsed (flamegraph), {prefix}.prof")
+    return text
+
+
+def profile_prefix(argv):
+    """Output prefix given after --profile-cycle, if any"""
+    index = argv.index('--profile-cycle')
+    if index + 1 < len(argv) and not argv[index + 1].startswith('--'):
+        return argv[index + 1]
+    return 'profile_cycle'
@@ -0,0 +1,54 @@
+"""
+Rate limiting helpers shared by the monitors
+Keeps concurrent workers polite towards the sites they query
+"""
+
+import threading
+import time
+
+
+class HostLimiter:
+    def __init__(self, min_interval=2.0):
+        """Space out request start times per host"""
+        self.min_interval = float(min_interval)
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        """Block until host may receive another request; returns seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """Allow `rate` operations per second with bursts up to `capacity`"""
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, self.rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1.0):
+        """Take tokens now and return how many seconds the caller must wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1.0):
+        """Block until tokens are available; returns seconds waited"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -0,0 +1,168 @@
+"""
+Local replay server for recorded API responses
+Serves saved SerpApi JSON, captured Turkish Airlines result pages and a fake Telegram Bot API
+so the monitors can run without network access
+
+Usage: python replay_server.py [fixture_dir] [port] [latency_seconds] [page_dir]
+Then set "serpapi_url": "http://127.0.0.1:8765/search.json",
+"replay_pages": "http://127.0.0.1:8765" (or a directory of pages, loaded over file://) and
+"telegram": {"api_base": "http://127.0.0.1:8765", ...} in config.json
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def page_fixture_names(origin, destination, date):
+    """Captured result pages that can stand in for a search, most specific first"""
+    stamp = date.strip().replace('.', '-')
+    return [
+        f"{origin}-{destination}-{stamp}.html",
+        # What extract_prices_from_page dumps when it finds no prices
+        f"debug_page_{stamp}.html",
+        f"{origin}-{destination}.html",
+        "default.html"
+    ]
+
+
+class FakeBotApi:
+    """Accepts sendMessage like Telegram does, including 1 msg/s per chat flood control"""
+
+    def __init__(self, per_chat_interval=1.0):
+        self.per_chat_interval = per_chat_interval
+        self.messages = []
+        self.rejected = 0
+        self._last_sent = {}
+        self._lock = threading.Lock()
+
+    def send_message(self, fields):
+        chat_id = fields.get('chat_id', [''])[0]
+        text = fields.get('text', [''])[0]
+        now = time.monotonic()
+        with self._lock:
+            if len(text) > 4096:
+                return 400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: message is too long'}
+            last = self._last_sent.get(chat_id)
+            # Telegram's flood control is not millisecond exact; allow a little jitter
+            if last is not None and now - last < self.per_chat_interval * 0.9:
+                self.rejected += 1
+                retry_after = max(1, round(self.per_chat_interval - (now - last)))
+                return 429, {'ok': False, 'error_code': 429,
+                             'description': f'Too Many Requests: retry after {retry_after}',
+                             'parameters': {'retry_after': retry_after}}
+            self._last_sent[chat_id] = now
+            self.messages.append((chat_id, text))
+            return 200, {'ok': True, 'result': {'message_id': len(self.messages)}}
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    fixture_dir = os.path.join('fixtures', 'serpapi')
+    page_dir = os.path.join('fixtures', 'html')
+    latency = 0.0
+    bot_api = None
+
+    def serpapi_fixture(self, query):
+        """Most specific recorded response for a search, falling back to default.json"""
+        origin = query.get('departure_id', [''])[0]
+        destination = query.get('arrival_id', [''])[0]
+        date = query.get('outbound_date', [''])[0]
+        for name in (f"{origin}-{destination}-{date}.json", f"{origin}-{destination}.json", "default.json"):
+            path = os.path.join(self.fixture_dir, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def page_fixture(self, query):
+        """Captured page for a booking search URL (originCode, destinationCode, departDate)"""
+        date = query.get('departDate', [''])[0]
+        if len(date) == 8 and date.isdigit():
+            # The booking URL's DDMMYYYY, named like the dumps of DD.MM.YYYY dates
+            date = f"{date[:2]}-{date[2:4]}-{date[4:]}"
+        names = page_fixture_names(
+            query.get('originCode', [''])[0], query.get('destinationCode', [''])[0], date
+        )
+        for name in names:
+            path = os.path.join(self.page_dir, name)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if url.path == '/search.json':
+            path = self.serpapi_fixture(parse_qs(url.query))
+            content_type = 'application/json'
+        elif url.path.endswith('/ucak-bileti/arama/'):
+            path = self.page_fixture(parse_qs(url.query))
+            content_type = 'text/html; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        if path is None:
+            self.send_error(404, "No fixture recorded for this search")
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if not (url.path.startswith('/bot') and url.path.endswith('/sendMessage')):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        fields = parse_qs(self.rfile.read(length).decode('utf-8'))
+        self.send_json(*self.bot_api.send_message(fields))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_replay_server(fixture_dir=None, port=0, latency=0.0, bot_api=None, page_dir=None):
+    """Start the server on a background thread; returns (server, base_url)"""
+    handler = type('Handler', (ReplayHandler,), {
+        'fixture_dir': fixture_dir or ReplayHandler.fixture_dir,
+        'page_dir': page_dir or ReplayHandler.page_dir,
+        'latency': latency,
+        'bot_api': bot_api or FakeBotApi()
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.bot_api = handler.bot_api
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8765
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    page_dir = sys.argv[4] if len(sys.argv) > 4 else None
+    server, base_url = start_replay_server(fixture_dir, port, latency, page_dir=page_dir)
+    print(f"🎞️  Replaying fixtures on {base_url}/search.json and {base_url}/tr-tr/ucak-bileti/arama/ (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
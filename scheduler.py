@@ -0,0 +1,270 @@
+"""
+Priority-aware check scheduler
+A min-heap of next-due times per search: dates close to departure or with moving prices are
+checked more often, stable far-out dates less, and everything stays within a request budget
+
+Usage: python scheduler.py [config.json] [days]
+Simulates that many days of scheduling for the watchlist offline and prints the request count
+"""
+
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+from calendar import monthrange
+from datetime import datetime, timedelta
+from travel_dates import days_until
+
+
+def minutes_left_in_month(now):
+    """Minutes from the epoch timestamp now until the start of next month"""
+    current = datetime.fromtimestamp(now)
+    days_in_month = monthrange(current.year, current.month)[1]
+    month_end = datetime(current.year, current.month, 1) + timedelta(days=days_in_month)
+    return max(1.0, (month_end - current).total_seconds() / 60)
+
+
+def quota_budget(quota):
+    """Budget callable that spreads a QuotaLedger's remaining searches over the rest of the month"""
+    return lambda now: quota.remaining(datetime.fromtimestamp(now)) / minutes_left_in_month(now)
+
+
+class CheckScheduler:
+    def __init__(self, base_interval=60, min_interval=15, max_interval=24 * 60, volatile_change=0.05,
+                 stable_change=0.01, budget=None, jitter=0.1, seed=None):
+        """
+        Intervals are in minutes; budget(now) returns how many checks per minute may be spent, or None
+        Price moves of volatile_change (fraction) or more speed a search up, below stable_change slow it down
+        """
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.volatile_change = volatile_change
+        self.stable_change = stable_change
+        self.budget = budget
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.heap = []
+        self.due_at = {}
+        self.rates = {}
+        self.demand = 0.0
+        self.movement = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self.due_at)
+
+    def _push(self, query, due):
+        self.due_at[query] = due
+        heapq.heappush(self.heap, (due, next(self._seq), query))
+
+    def add_many(self, queries, now):
+        """
+        Schedule new searches, staggered across one base interval so they do not all fire at once;
+        the interval is stretched by the budget like every later check, so first checks fit it too
+        """
+        queries = [q for q in queries if q not in self.due_at]
+        for query in queries:
+            self._set_rate(query, now)
+        scale = self.budget_scale(now)
+        start = now
+        if scale == float('inf'):
+            # Budget exhausted: start at the beginning of next month
+            start += minutes_left_in_month(now) * 60
+            scale = 1.0
+        spread = self.base_interval * 60 * scale
+        for i, query in enumerate(queries):
+            self._push(query, start + spread * i / max(1, len(queries)))
+
+    def remove(self, query):
+        """Stop checking a search; its heap entry is discarded lazily"""
+        self.due_at.pop(query, None)
+        self.demand -= self.rates.pop(query, 0.0)
+        self.movement.pop(query, None)
+
+    def observe(self, query, price):
+        """Fold a new lowest price into the search's average relative movement"""
+        last, change = self.movement.get(query, (None, None))
+        if last:
+            step = abs(price - last) / last
+            change = step if change is None else 0.5 * step + 0.5 * change
+        self.movement[query] = (price, change)
+
+    def interval(self, query, now):
+        """Minutes until the next check before the budget is applied, or None once the date has passed"""
+        try:
+            days_left = days_until(query.date, datetime.fromtimestamp(now).date())
+        except ValueError:
+            days_left = 30
+        if days_left < 0:
+            return None
+
+        if days_left <= 3:
+            factor = 0.25
+        elif days_left <= 7:
+            factor = 0.5
+        elif days_left <= 30:
+            factor = 1.0
+        elif days_left <= 60:
+            factor = 2.0
+        else:
+            factor = 4.0
+
+        _, change = self.movement.get(query, (None, None))
+        if change is not None:
+            if change >= self.volatile_change:
+                factor *= 0.5
+            elif change < self.stable_change:
+                factor *= 1.5
+        return min(self.max_interval, max(self.min_interval, self.base_interval * factor))
+
+    def _set_rate(self, query, now):
+        minutes = self.interval(query, now)
+        rate = 1.0 / minutes if minutes else 0.0
+        self.demand += rate - self.rates.get(query, 0.0)
+        self.rates[query] = rate
+        return minutes
+
+    def budget_scale(self, now):
+        """Factor (>= 1) by which every interval is stretched so total demand fits the budget"""
+        if self.budget is None:
+            return 1.0
+        allowed = self.budget(now)
+        if allowed <= 0:
+            return float('inf')
+        return max(1.0, self.demand / allowed)
+
+    def pop_due(self, now):
+        """Remove and return every search due at or before now, most overdue first"""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            at, _, query = heapq.heappop(self.heap)
+            if self.due_at.get(query) == at:
+                del self.due_at[query]
+                due.append(query)
+        return due
+
+    def reschedule(self, query, now):
+        """Put a checked search back on the heap; returns minutes until it is due, or None if dropped"""
+        minutes = self._set_rate(query, now)
+        if minutes is None:
+            self.remove(query)
+            return None
+        scale = self.budget_scale(now)
+        if scale == float('inf'):
+            # Budget exhausted: look again at the start of next month
+            minutes = minutes_left_in_month(now)
+        else:
+            minutes *= scale
+        # A little jitter keeps searches that started together from firing together forever
+        minutes *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        self._push(query, now + minutes * 60)
+        return minutes
+
+    def next_due(self):
+        """Timestamp of the earliest scheduled check, or None when nothing is scheduled"""
+        while self.heap and self.due_at.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+
+def simulate(scheduler, queries, start, days=30, seed=0, step_minutes=1):
+    """
+    Run the scheduler against a random-walk price model without any network
+    Returns total checks, checks per search, the busiest hour and the checks spent per month
+    """
+    rng = random.Random(seed)
+    prices = {q: rng.uniform(1500, 3000) for q in queries}
+    # Some searches move a lot, most barely move
+    volatility = {q: rng.choice((0.002, 0.005, 0.01, 0.08)) for q in queries}
+    counts = {q: 0 for q in queries}
+    per_hour = {}
+    per_month = {}
+
+    scheduler.add_many(queries, start)
+    now = start
+    end = start + days * 86400
+    while now < end:
+        due = scheduler.pop_due(now)
+        for query in due:
+            prices[query] *= 1 + rng.gauss(0, volatility[query])
+            counts[query] += 1
+            hour = int((now - start) // 3600)
+            per_hour[hour] = per_hour.get(hour, 0) + 1
+            month = datetime.fromtimestamp(now).strftime('%Y-%m')
+            per_month[month] = per_month.get(month, 0) + 1
+            scheduler.observe(query, prices[query])
+            scheduler.reschedule(query, now)
+        next_due = scheduler.next_due()
+        if next_due is None:
+            break
+        now = max(now + step_minutes * 60, next_due)
+
+    return {
+        'checks': sum(counts.values()),
+        'per_query': counts,
+        'busiest_hour': max(per_hour.values()) if per_hour else 0,
+        'per_month': per_month,
+        'volatility': volatility
+    }
+
+
+class _SimulatedQuota:
+    """Monthly limit for simulations: spends are counted per calendar month"""
+
+    def __init__(self, monthly_limit):
+        self.monthly_limit = monthly_limit
+        self.spent = {}
+
+    def remaining(self, now):
+        return max(0, self.monthly_limit - self.spent.get(now.strftime('%Y-%m'), 0))
+
+
+def main():
+    from watchlist import Watchlist, load_watchlist
+
+    config_file = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    config = {}
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    settings = config.get('scheduler', {})
+    queries = Watchlist(load_watchlist(config)).queries()
+    monthly_limit = config.get('serpapi_monthly_quota')
+
+    quota = _SimulatedQuota(monthly_limit) if monthly_limit else None
+    scheduler = CheckScheduler(
+        base_interval=settings.get('base_interval_minutes', config.get('check_interval_minutes', 60)),
+        min_interval=settings.get('min_interval_minutes', 15),
+        max_interval=settings.get('max_interval_minutes', 24 * 60),
+        budget=quota_budget(quota) if quota else None,
+        seed=0
+    )
+    if quota:
+        # Count each simulated check against the month it happens in
+        reschedule = scheduler.reschedule
+
+        def counted(query, now):
+            month = datetime.fromtimestamp(now).strftime('%Y-%m')
+            quota.spent[month] = quota.spent.get(month, 0) + 1
+            return reschedule(query, now)
+        scheduler.reschedule = counted
+
+    start = datetime.now().timestamp()
+    result = simulate(scheduler, queries, start, days)
+    fixed = len(queries) * days * 24 * 60 / config.get('check_interval_minutes', 60)
+    print(f"🗓️  Simulated {days} days for {len(queries)} searches")
+    print(f"   Scheduled checks: {result['checks']} (fixed interval would use {fixed:.0f})")
+    print(f"   Busiest hour: {result['busiest_hour']} checks")
+    for month, spent in sorted(result['per_month'].items()):
+        print(f"   {month}: {spent} checks" + (f" of {monthly_limit}" if monthly_limit else ""))
+    for query, count in sorted(result['per_query'].items(), key=lambda item: -item[1]):
+        print(f"   {query.route} {query.date}: {count} checks "
+              f"(moves ~{result['volatility'][query]:.1%} per check)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Persisted cache of which CSS selector last matched each form field
+Lets the search flow try the known-good selector first instead of the full list
+"""
+
+import json
+import os
+import threading
+from metrics import NullMetrics
+
+
+class SelectorCache:
+    def __init__(self, cache_file='selector_cache.json', metrics=None):
+        """Load cached winners and hit/miss stats from disk"""
+        self.cache_file = cache_file
+        self.metrics = metrics or NullMetrics()
+        self._lock = threading.Lock()
+        self.winners = {}
+        self.stats = {}
+        self._dirty = False
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.winners = data.get('winners', {})
+                self.stats = data.get('stats', {})
+            except (OSError, ValueError):
+                print(f"⚠️  Ignoring unreadable selector cache {cache_file}")
+
+    def _field_stats(self, field):
+        return self.stats.setdefault(field, {'hits': 0, 'misses': 0, 'failures': 0})
+
+    def ordered(self, field, selectors):
+        """Return selectors with the cached winner moved to the front"""
+        winner = self.winners.get(field)
+        if winner in selectors:
+            return [winner] + [s for s in selectors if s != winner]
+        return list(selectors)
+
+    def record_win(self, field, selector):
+        """Note which selector worked; a hit if it was already the cached one"""
+        with self._lock:
+            stats = self._field_stats(field)
+            if self.winners.get(field) == selector:
+                result = 'hits'
+            else:
+                result = 'misses'
+                self.winners[field] = selector
+            stats[result] += 1
+            self._dirty = True
+        # The persisted stats are running totals, so the counter follows each lookup instead
+        self.metrics.inc('selector_cache_total', field=field, result=result)
+
+    def record_failure(self, field):
+        """Note that no selector worked for field"""
+        with self._lock:
+            self._field_stats(field)['failures'] += 1
+            self._dirty = True
+        self.metrics.inc('selector_cache_total', field=field, result='failures')
+
+    def hit_ratio(self, field):
+        """Share of lookups answered by the cached selector"""
+        stats = self.stats.get(field, {})
+        total = stats.get('hits', 0) + stats.get('misses', 0) + stats.get('failures', 0)
+        return stats.get('hits', 0) / total if total else 0.0
+
+    def save(self):
+        """Write the cache to disk if anything changed"""
+        with self._lock:
+            if not self._dirty or not self.cache_file:
+                return
+            data = {'winners': self.winners, 'stats': self.stats}
+            self._dirty = False
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
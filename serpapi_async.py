@@ -0,0 +1,37 @@
+"""
+Concurrent fan-out of SerpApi searches
+Runs every (origin, destination, date) search at once under a concurrency cap and a token-bucket rate limit
+"""
+
+import asyncio
+from rate_limit import TokenBucket
+
+
+async def _fetch_one(fetch, job, semaphore, bucket):
+    async with semaphore:
+        if bucket is not None:
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        # The blocking HTTP call runs on the default executor so other searches keep going
+        return await asyncio.to_thread(fetch, *job)
+
+
+async def fetch_many(fetch, jobs, concurrency=4, rate_per_second=None, burst=None):
+    """
+    Run fetch(*job) for every job concurrently
+    Returns {job: result}; a job that raised maps to an empty list
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+    results = await asyncio.gather(
+        *(_fetch_one(fetch, job, semaphore, bucket) for job in jobs),
+        return_exceptions=True
+    )
+    fetched = {}
+    for job, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            print(f"   ❌ Search {' '.join(map(str, job))} failed: {result}")
+            result = []
+        fetched[job] = result
+    return fetched
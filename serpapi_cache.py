@@ -0,0 +1,165 @@
+"""
+On-disk SerpApi response cache and monthly quota ledger
+Keeps the monitor inside the SerpApi free tier (100 searches/month)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from calendar import monthrange
+from travel_dates import days_until
+
+# Parameters that identify a search; api_key and language never change the answer
+CACHE_KEY_PARAMS = ('engine', 'departure_id', 'arrival_id', 'outbound_date', 'currency', 'type', 'travel_class',
+                    'adults', 'children')
+
+# (max days until departure, cache hours): fares move faster close to departure
+DEFAULT_TTL_TIERS = [(3, 1), (14, 4), (60, 12), (None, 24)]
+
+
+def cache_key(params):
+    """Stable key for a SerpApi search"""
+    return '|'.join(str(params.get(name, '')) for name in CACHE_KEY_PARAMS)
+
+
+def ttl_for(travel_date, tiers=None):
+    """Cache lifetime in seconds for a search on travel_date"""
+    try:
+        days = days_until(travel_date)
+    except ValueError:
+        days = None
+    for max_days, hours in tiers or DEFAULT_TTL_TIERS:
+        if max_days is None or (days is not None and days <= max_days):
+            return hours * 3600
+    return 3600
+
+
+class SerpApiCache:
+    def __init__(self, cache_file='serpapi_cache.db', max_bytes=20 * 1024 * 1024, ttl_tiers=None):
+        """Open the response cache; least recently used entries go once max_bytes is exceeded"""
+        self.max_bytes = max_bytes
+        self.ttl_tiers = ttl_tiers
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'evictions': 0}
+        self.conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self.conn.commit()
+
+    def get(self, params, allow_stale=False):
+        """Cached response for params, or None; expired entries only with allow_stale"""
+        now = time.time()
+        key = cache_key(params)
+        with self._lock:
+            row = self.conn.execute("SELECT body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] < now and not allow_stale):
+                if not allow_stale:
+                    self.stats['misses'] += 1
+                return None
+            self.stats['stale_hits' if row[1] < now else 'hits'] += 1
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return json.loads(row[0])
+
+    def put(self, params, data):
+        """Store a response with a TTL based on how close the travel date is"""
+        now = time.time()
+        body = json.dumps(data, ensure_ascii=False)
+        ttl = ttl_for(params.get('outbound_date', ''), self.ttl_tiers)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(params), body, len(body), now, now + ttl, now)
+            )
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.stats['evictions'] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def hit_ratio(self):
+        """Share of lookups served from cache (fresh or stale)"""
+        hits = self.stats['hits'] + self.stats['stale_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+
+class QuotaLedger:
+    def __init__(self, ledger_file='serpapi_quota.json', monthly_limit=100, high_priority_days=14):
+        """Track searches spent per calendar month"""
+        self.ledger_file = ledger_file
+        self.monthly_limit = monthly_limit
+        self.high_priority_days = high_priority_days
+        self._lock = threading.Lock()
+        self.months = {}
+        if os.path.exists(ledger_file):
+            with open(ledger_file, 'r', encoding='utf-8') as f:
+                self.months = json.load(f)
+
+    def _month(self, now=None):
+        return (now or datetime.now()).strftime('%Y-%m')
+
+    def used(self, now=None):
+        """Searches spent this month"""
+        return self.months.get(self._month(now), 0)
+
+    def remaining(self, now=None):
+        """Searches left this month"""
+        return max(0, self.monthly_limit - self.used(now))
+
+    def is_high_priority(self, travel_date):
+        """Dates close to departure are always worth a search"""
+        try:
+            return days_until(travel_date) <= self.high_priority_days
+        except ValueError:
+            return True
+
+    def allow(self, travel_date, now=None):
+        """
+        Whether a live search may be spent on travel_date
+        Low-priority searches stop once the month's spending runs ahead of an even pace
+        """
+        now = now or datetime.now()
+        remaining = self.remaining(now)
+        if remaining <= 0:
+            return False
+        if self.is_high_priority(travel_date):
+            return True
+        days_in_month = monthrange(now.year, now.month)[1]
+        days_left = days_in_month - now.day + 1
+        # Keep a share of the budget proportional to the days still to come
+        reserve = self.monthly_limit * (days_left - 1) / days_in_month
+        return remaining > reserve
+
+    def spend(self, travel_date, now=None):
+        """Atomically check allow() and record the search; returns False when it must be skipped"""
+        with self._lock:
+            if not self.allow(travel_date, now):
+                return False
+            month = self._month(now)
+            self.months[month] = self.months.get(month, 0) + 1
+            tmp_file = self.ledger_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.months, f, indent=2)
+            os.replace(tmp_file, self.ledger_file)
+            return True
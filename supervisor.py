@@ -0,0 +1,232 @@
+"""
+Multi-process supervisor for large watchlists
+Splits the watched (origin, destination, date) searches across worker processes with a consistent
+hash ring; every worker runs its own monitor loop on its share and writes to the shared SQLite history,
+while the supervisor sends the alerts (once per price) and restarts workers that crash
+
+Usage: python supervisor.py [workers] [--serpapi]
+"""
+
+import bisect
+import hashlib
+import importlib
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+MONITORS = {
+    'selenium': 'flight_monitor',
+    'serpapi': 'flight_monitor_serpapi'
+}
+
+# Seconds before a crashed worker is started again; doubles per crash up to the maximum
+RESTART_DELAY = 5
+MAX_RESTART_DELAY = 300
+# A worker that stayed up this long is considered healthy again
+STABLE_SECONDS = 600
+
+
+def ring_hash(key):
+    """Stable 64-bit hash (the built-in hash() differs between processes)"""
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+def shard_key(query):
+    """What decides a search's worker: its route and date, so every party size of it lands together"""
+    return f"{query.origin}-{query.destination}-{query.date.strip()}"
+
+
+class HashRing:
+    def __init__(self, nodes, replicas=100):
+        """Consistent hash ring; each node gets several points so shares stay even"""
+        self.ring = sorted((ring_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas))
+        self.points = [point for point, _ in self.ring]
+
+    def node_for(self, key):
+        """Node owning key: the first point clockwise from its hash"""
+        i = bisect.bisect(self.points, ring_hash(key)) % len(self.points)
+        return self.ring[i][1]
+
+
+def assign(queries, workers):
+    """{worker index: [queries]} for every worker, empty shares included"""
+    ring = HashRing(range(workers))
+    shares = {index: [] for index in range(workers)}
+    for query in queries:
+        shares[ring.node_for(shard_key(query))].append(query)
+    return shares
+
+
+def worker_overrides(config, index, workers):
+    """Settings that keep a worker's local files and ports apart from the other workers'"""
+    overrides = {
+        'history_backend': 'sqlite',
+        'notification_queue': {'enabled': False},
+        'selector_cache_file': f"selector_cache.worker{index}.json"
+    }
+    # Each worker owns its dates outright, so its running stats never overlap another worker's
+    rules = config.get('alert_rules', {})
+    overrides['alert_rules'] = dict(rules, stats_file=f"price_stats.worker{index}.json")
+    # The monthly SerpApi budget is split evenly instead of sharing one ledger file between processes
+    overrides['serpapi_quota_file'] = f"serpapi_quota.worker{index}.json"
+    overrides['serpapi_monthly_quota'] = max(1, config.get('serpapi_monthly_quota', 100) // workers)
+    scheduler = config.get('scheduler', {})
+    if scheduler.get('max_checks_per_hour'):
+        overrides['scheduler'] = dict(scheduler, max_checks_per_hour=scheduler['max_checks_per_hour'] / workers)
+    metrics = config.get('metrics', {})
+    if metrics.get('enabled', False):
+        port = metrics.get('port', 9108)
+        overrides['metrics'] = dict(metrics, port=port + 1 + index if port else 0)
+        if metrics.get('json_log') and metrics['json_log'] != '-':
+            overrides['metrics']['json_log'] = f"{metrics['json_log']}.worker{index}"
+    return overrides
+
+
+def stop_on_sigterm(signum, frame):
+    """Let a terminated worker quit its browsers on the way out"""
+    raise KeyboardInterrupt
+
+
+def run_worker(kind, config_file, overrides, index, workers, outbox):
+    """Worker process: monitor loop over this worker's share, alerts go to the supervisor"""
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    monitor = getattr(importlib.import_module(MONITORS[kind]), 'FlightPriceMonitor')(config_file, overrides)
+    mine = assign(monitor.watchlist.queries(), workers)[index]
+    print(f"👷 Worker {index}: {len(mine)} searches (pid {os.getpid()})")
+    # The supervisor sends alerts, so a price seen by two workers is only announced once
+    monitor.send_notifications = lambda alerts: outbox.put((index, alerts))
+    if monitor.scheduler is not None:
+        owned = set(mine)
+        for query in monitor.watchlist.queries():
+            if query not in owned:
+                monitor.scheduler.remove(query)
+    check_interval = monitor.config.get('check_interval_minutes', 60)
+    try:
+        while True:
+            if monitor.scheduler is not None:
+                monitor.run_due_checks()
+                continue
+            if mine:
+                monitor.check_and_notify(mine)
+            time.sleep(check_interval * 60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if hasattr(monitor, 'close_driver_pool'):
+            monitor.close_driver_pool()
+        monitor.metrics.close()
+
+
+class AlertDeduper:
+    def __init__(self, window_minutes=360):
+        """Drop alerts for a price already announced within the window"""
+        self.window = window_minutes * 60
+        self.sent = {}
+
+    def fresh(self, alerts, now=None):
+        """Alerts not announced within the window; they count as announced from now"""
+        now = now or time.time()
+        self.sent = {key: at for key, at in self.sent.items() if now - at < self.window}
+        result = []
+        for alert in alerts:
+            key = (alert['route'], alert['date'].strip(), alert.get('watch'), alert['min_price'])
+            if key in self.sent:
+                continue
+            self.sent[key] = now
+            result.append(alert)
+        return result
+
+
+class Supervisor:
+    def __init__(self, config_file='config.json', workers=None, kind='selenium'):
+        """Load the config once and plan the worker shares"""
+        self.kind = kind
+        self.config_file = config_file
+        # The supervisor's own monitor imports any JSON history into SQLite before workers start, and sends alerts
+        self.monitor = getattr(importlib.import_module(MONITORS[kind]), 'FlightPriceMonitor')(
+            config_file, {'history_backend': 'sqlite', 'scheduler': {'enabled': False}}
+        )
+        # Worker shares are derived from the file's own settings, not the overrides above
+        self.config = self.monitor.load_config(config_file)
+        settings = self.monitor.config.get('supervisor', {})
+        self.workers = workers or settings.get('workers') or os.cpu_count() or 1
+        self.deduper = AlertDeduper(settings.get('alert_dedup_minutes', 360))
+        self.context = multiprocessing.get_context('spawn')
+        self.outbox = self.context.Queue()
+        self.processes = {}
+        self.started_at = {}
+        self.restart_delay = {}
+        self.restart_at = {}
+
+    def start_worker(self, index):
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.kind, self.config_file, worker_overrides(self.config, index, self.workers),
+                  index, self.workers, self.outbox),
+            name=f"monitor-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.time()
+
+    def check_workers(self):
+        """Restart workers that exited, backing off when one keeps crashing"""
+        now = time.time()
+        for index, process in self.processes.items():
+            if process.is_alive():
+                continue
+            if index not in self.restart_at:
+                if now - self.started_at[index] > STABLE_SECONDS:
+                    self.restart_delay[index] = RESTART_DELAY
+                delay = self.restart_delay.get(index, RESTART_DELAY)
+                self.restart_delay[index] = min(delay * 2, MAX_RESTART_DELAY)
+                self.restart_at[index] = now + delay
+                print(f"💥 Worker {index} exited with code {process.exitcode} - restarting in {delay}s")
+            elif now >= self.restart_at[index]:
+                del self.restart_at[index]
+                self.start_worker(index)
+                print(f"🔁 Worker {index} restarted")
+
+    def handle_alerts(self, index, alerts):
+        fresh = self.deduper.fresh(alerts)
+        if len(fresh) < len(alerts):
+            print(f"🔕 {len(alerts) - len(fresh)} alerts from worker {index} were already sent")
+        if fresh:
+            self.monitor.send_notifications(fresh)
+
+    def run(self):
+        shares = assign(self.monitor.watchlist.queries(), self.workers)
+        print(f"🧭 Supervisor: {sum(len(s) for s in shares.values())} searches over {self.workers} "
+              f"{self.kind} workers ({', '.join(str(len(s)) for s in shares.values())})")
+        for index in range(self.workers):
+            self.start_worker(index)
+        try:
+            while True:
+                try:
+                    index, alerts = self.outbox.get(timeout=5)
+                    self.handle_alerts(index, alerts)
+                except queue.Empty:
+                    pass
+                self.check_workers()
+        except KeyboardInterrupt:
+            print("\n\n👋 Supervisor stopping workers")
+        finally:
+            for process in self.processes.values():
+                process.terminate()
+            for process in self.processes.values():
+                process.join(10)
+            if self.monitor.notification_queue is not None:
+                self.monitor.notification_queue.stop()
+            self.monitor.metrics.close()
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    Supervisor(
+        workers=int(args[0]) if args else None,
+        kind='serpapi' if '--serpapi' in sys.argv else 'selenium'
+    ).run()
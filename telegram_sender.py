@@ -0,0 +1,169 @@
+"""
+Rate-limit-aware Telegram sender
+Splits long HTML messages safely, paces sends per chat and globally, and obeys 429 retry_after
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from rate_limit import TokenBucket
+
+TELEGRAM_API = "https://api.telegram.org"
+MAX_MESSAGE_LENGTH = 4096
+
+# Tokens are tags (<b>, </b>, <a href="...">) or entities (&amp;) and must never be cut in half
+TOKEN_PATTERN = re.compile(r'<[^>]*>|&[#\w]+;|[^<&]+|[<&]')
+TAG_PATTERN = re.compile(r'<(/?)([a-zA-Z-]+)')
+
+
+def _close_tags(open_tags):
+    return ''.join(f"</{name}>" for name, _ in reversed(open_tags))
+
+
+def _reopen_tags(open_tags):
+    return ''.join(tag for _, tag in open_tags)
+
+
+def split_html_message(text, limit=MAX_MESSAGE_LENGTH):
+    """
+    Split Telegram HTML into chunks of at most `limit` characters
+    Prefers line breaks, never cuts inside a tag or entity, and closes/reopens open tags across chunks
+    """
+    if len(text) <= limit:
+        return [text]
+
+    # Break text runs at newlines so chunks preferably end on a line boundary
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        if token.startswith('<') or token.startswith('&'):
+            tokens.append(token)
+        else:
+            tokens.extend(t for t in re.split(r'(?<=\n)', token) if t)
+
+    chunks = []
+    current = ''
+    open_tags = []
+    for token in tokens:
+        match = TAG_PATTERN.match(token)
+        opening = match is not None and not match.group(1) and not token.endswith('/>')
+        # An opening tag also needs room for the closing tag that may have to follow it
+        extra = len(f"</{match.group(2)}>") if opening else 0
+        while True:
+            overhead = len(_close_tags(open_tags)) + extra
+            if len(current) + len(token) + overhead <= limit:
+                break
+            fresh = _reopen_tags(open_tags)
+            room = limit - len(current) - overhead
+            if not token.startswith(('<', '&')) and room > 0 and (len(token) > limit // 2 or current == fresh):
+                # An oversized text run: cut it where it must be cut
+                current += token[:room]
+                token = token[room:]
+            if current == fresh:
+                # Nothing to flush; emit the token as-is rather than loop forever
+                break
+            chunks.append(current + _close_tags(open_tags))
+            current = fresh
+        current += token
+
+        if match and not token.endswith('/>'):
+            name = match.group(2).lower()
+            if opening:
+                open_tags.append((name, token))
+            else:
+                for i in range(len(open_tags) - 1, -1, -1):
+                    if open_tags[i][0] == name:
+                        del open_tags[i]
+                        break
+
+    if current.strip() and current != _reopen_tags(open_tags):
+        chunks.append(current + _close_tags(open_tags))
+    return chunks
+
+
+class TelegramSender:
+    def __init__(self, bot_token, transport, api_base=TELEGRAM_API, per_chat_rate=1.0, global_rate=30.0,
+                 max_retries=3):
+        """Send through the shared HTTP transport within Telegram's flood limits"""
+        self.bot_token = bot_token
+        self.transport = transport
+        self.api_base = api_base.rstrip('/')
+        self.per_chat_rate = per_chat_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.max_retries = max_retries
+        self._chat_buckets = {}
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.stats = {'sent': 0, 'failed': 0, 'rate_limited': 0}
+
+    def _chat_bucket(self, chat_id):
+        with self._lock:
+            if chat_id not in self._chat_buckets:
+                self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+            return self._chat_buckets[chat_id]
+
+    def _send_chunk(self, chat_id, text, parse_mode):
+        url = f"{self.api_base}/bot{self.bot_token}/sendMessage"
+        data = {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode}
+        for attempt in range(self.max_retries + 1):
+            self._chat_bucket(chat_id).acquire()
+            self.global_bucket.acquire()
+            started = time.monotonic()
+            response = self.transport.post(url, data=data, retries=0)
+            with self._lock:
+                self.latencies.append(time.monotonic() - started)
+            if response.status_code == 200:
+                return True
+            if response.status_code == 429 and attempt < self.max_retries:
+                with self._lock:
+                    self.stats['rate_limited'] += 1
+                try:
+                    retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                except ValueError:
+                    retry_after = 1
+                time.sleep(retry_after)
+                continue
+            print(f"⚠️  Telegram notification failed: {response.text}")
+            return False
+        return False
+
+    def send(self, chat_ids, text, parse_mode='HTML', delivered=None):
+        """
+        Send text to one chat id or a comma-separated list; True if every chunk arrived
+        delivered is a list of "chat_id:chunk" marks that is extended as chunks arrive; passing
+        the same list again on a retry only sends what has not arrived yet
+        """
+        if isinstance(chat_ids, str):
+            chat_ids = [c.strip() for c in chat_ids.split(',') if c.strip()]
+        chunks = split_html_message(text) if parse_mode == 'HTML' else [
+            text[i:i + MAX_MESSAGE_LENGTH] for i in range(0, len(text), MAX_MESSAGE_LENGTH)
+        ]
+        if delivered is None:
+            delivered = []
+        ok = True
+        for chat_id in chat_ids:
+            for index, chunk in enumerate(chunks):
+                mark = f"{chat_id}:{index}"
+                if mark in delivered:
+                    continue
+                arrived = self._send_chunk(chat_id, chunk, parse_mode)
+                with self._lock:
+                    self.stats['sent' if arrived else 'failed'] += 1
+                if not arrived:
+                    # Later chunks of this chat wait for the retry so they stay in order
+                    ok = False
+                    break
+                delivered.append(mark)
+        return ok
+
+    def latency_summary(self):
+        """Average and 95th percentile latency of the last 1000 sends, in seconds"""
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return {'count': 0, 'avg': 0.0, 'p95': 0.0}
+        return {
+            'count': len(values),
+            'avg': sum(values) / len(values),
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))]
+        }
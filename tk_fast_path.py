@@ -0,0 +1,106 @@
+"""
+Browser-free fast path for Turkish Airlines prices (opt-in with fast_path)
+Requests the booking search URL over the shared keep-alive transport and reads fares from the payload's
+JSON (a JSON response or the page's embedded JSON state), so a date costs one HTTP round trip instead of
+a Chrome page load. Only amounts inside objects that name the searched route and date are taken; the
+page's visible text is never scanned, since it also holds promotions and fee tables. The Selenium flow
+is used whenever this comes back empty
+"""
+
+import threading
+from urllib.parse import urlparse
+import requests
+from price_extraction import prices_for_search, prices_from_embedded_json
+from travel_dates import parse_travel_date
+
+TK_BASE = 'https://www.turkishairlines.com'
+BOOKING_PATH = '/tr-tr/ucak-bileti/arama/'
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'tr-TR,tr;q=0.9,en;q=0.8'
+}
+
+# Bot-protection interstitials come back as 200s without prices
+BLOCK_MARKERS = ('captcha', 'Access Denied', '_Incapsula_Resource', 'cf-chl-', 'Request unsuccessful')
+
+
+def booking_url(origin, destination, date, adults=1, children=0, base=TK_BASE):
+    """Booking search URL for a one-way search (departDate is DDMMYYYY)"""
+    try:
+        depart = parse_travel_date(date).strftime('%d%m%Y')
+    except ValueError:
+        depart = date.replace('.', '').replace('-', '')
+    return (f"{base.rstrip('/')}{BOOKING_PATH}?adultCount={adults}&childCount={children}&infantCount=0"
+            f"&departDate={depart}&arrivalDate=&tripType=O&originCode={origin}&destinationCode={destination}")
+
+
+def prices_from_response(response, query):
+    """Prices for a watchlist search from a booking/availability response body, JSON or HTML"""
+    if 'json' in response.headers.get('Content-Type', ''):
+        return prices_for_search(response.json(), query.origin, query.destination, query.date)
+    return prices_from_embedded_json(response.text, query.origin, query.destination, query.date)
+
+
+class FastPathFetcher:
+    def __init__(self, transport, host_limiter=None, base=TK_BASE, max_misses=3, retry_every=20, metrics=None):
+        """Direct HTTP price fetcher; after max_misses empty answers in a row it only probes every retry_every searches"""
+        self.transport = transport
+        self.host_limiter = host_limiter
+        self.base = base
+        self.host = urlparse(base).hostname
+        self.max_misses = max_misses
+        self.retry_every = retry_every
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self.consecutive_misses = 0
+        self.skipped = 0
+        self.stats = {'hits': 0, 'misses': 0, 'blocked': 0, 'errors': 0, 'skipped': 0}
+
+    def should_try(self):
+        """False while the site keeps answering without prices, except for an occasional probe"""
+        with self._lock:
+            if self.consecutive_misses < self.max_misses:
+                return True
+            self.skipped += 1
+            if self.skipped % self.retry_every == 0:
+                return True
+            self.stats['skipped'] += 1
+            return False
+
+    def _result(self, outcome, prices=None):
+        # check_batch runs on parallel_workers threads
+        with self._lock:
+            if outcome == 'hits':
+                self.consecutive_misses = 0
+            else:
+                self.consecutive_misses += 1
+            self.stats[outcome] += 1
+        if self.metrics is not None:
+            self.metrics.inc('fast_path_total', result=outcome)
+        return prices
+
+    def fetch(self, query):
+        """Prices for a watchlist search, or None when the browser has to do it"""
+        url = booking_url(query.origin, query.destination, query.date, query.adults, query.children, self.base)
+        if self.host_limiter is not None:
+            self.host_limiter.wait(self.host)
+        try:
+            response = self.transport.get(url, headers=REQUEST_HEADERS, retries=1)
+        except requests.RequestException as e:
+            print(f"   ⚠️ Fast path request failed: {str(e)}")
+            return self._result('errors')
+        if response.status_code != 200:
+            return self._result('blocked' if response.status_code in (403, 429) else 'misses')
+        if 'json' not in response.headers.get('Content-Type', '') and any(m in response.text for m in BLOCK_MARKERS):
+            return self._result('blocked')
+        try:
+            prices = prices_from_response(response, query)
+        except ValueError:
+            prices = []
+        if not prices:
+            return self._result('misses')
+        for p in prices:
+            p['source'] = 'http'
+        return self._result('hits', prices)
@@ -0,0 +1,97 @@
+"""
+Travel date helpers
+The Selenium monitor uses DD.MM.YYYY dates, the SerpApi monitor YYYY-MM-DD
+"""
+
+import re
+from datetime import datetime, timedelta, date as date_type
+
+MONTHS = {
+    'oca': 1, 'şub': 2, 'mar': 3, 'nis': 4, 'may': 5, 'haz': 6,
+    'tem': 7, 'ağu': 8, 'eyl': 9, 'eki': 10, 'kas': 11, 'ara': 12,
+    'jan': 1, 'feb': 2, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+DAY_MONTH_PATTERN = re.compile(r'(\d{1,2})[\s./]+(\d{1,2}|[^\W\d_]{3,})')
+
+
+def parse_travel_date(value):
+    """Parse a travel date in either supported format into a date"""
+    value = value.strip()
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised travel date: {value}")
+
+
+def days_until(value, today=None):
+    """Days from today until the travel date (negative once it has passed)"""
+    today = today or date_type.today()
+    return (parse_travel_date(value) - today).days
+
+
+def format_like(day, sample):
+    """Format a date the same way as sample (YYYY-MM-DD or DD.MM.YYYY)"""
+    return day.strftime('%Y-%m-%d' if '-' in sample else '%d.%m.%Y')
+
+
+def expand_dates(spec, today=None):
+    """
+    Lazily yield travel dates from one spec: a single date (kept as given), or a
+    'first..last' range or flexible window (days that have passed are skipped) such as
+    {"from": "2026-02-01", "to": "2026-02-28", "nights": [2, 4], "weekdays": [4, 5]}
+    The monitors search one-way fares, so "nights" only keeps outbound dates whose shortest stay fits the window
+    """
+    today = today or date_type.today()
+    if isinstance(spec, dict):
+        first, last = spec['from'], spec['to']
+        nights = spec.get('nights') or [0]
+        weekdays = spec.get('weekdays')
+    elif '..' in spec:
+        first, last = spec.split('..', 1)
+        nights, weekdays = [0], None
+    else:
+        yield spec.strip()
+        return
+
+    day = max(parse_travel_date(first), today)
+    end = parse_travel_date(last) - timedelta(days=min(nights))
+    while day <= end:
+        if weekdays is None or day.weekday() in weekdays:
+            yield format_like(day, first)
+        day += timedelta(days=1)
+
+
+def expand_all(specs, today=None):
+    """Chain expand_dates over a list of specs, dropping duplicates"""
+    seen = set()
+    for spec in specs:
+        if isinstance(spec, str) and not spec.strip():
+            continue
+        for value in expand_dates(spec, today):
+            if value not in seen:
+                seen.add(value)
+                yield value
+
+
+def parse_calendar_day(text, anchor):
+    """
+    Date named by a fare-calendar cell such as 'Çar 04 Şub' or '04.02', or None
+    The year is the one that puts the date closest to the anchor date
+    """
+    for match in DAY_MONTH_PATTERN.finditer(text):
+        day = int(match.group(1))
+        month_text = match.group(2)
+        month = int(month_text) if month_text.isdigit() else MONTHS.get(month_text[:3].lower())
+        if not month or not 1 <= month <= 12:
+            continue
+        candidates = []
+        for year in (anchor.year - 1, anchor.year, anchor.year + 1):
+            try:
+                candidates.append(date_type(year, month, day))
+            except ValueError:
+                continue
+        if candidates:
+            return min(candidates, key=lambda d: abs((d - anchor).days))
+    return None
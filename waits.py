@@ -0,0 +1,122 @@
+"""
+Condition-driven waits for the Selenium search flow
+Each stage waits only as long as the page needs, up to a per-stage budget
+"""
+
+import threading
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from price_extraction import PRICE_NODES_SCRIPT
+from metrics import NullMetrics
+
+# Seconds each stage may take before we give up and move on
+DEFAULT_BUDGETS = {
+    'page_load': 20,
+    'cookie_banner': 3,
+    'autocomplete': 5,
+    'results': 25,
+    'prices_stable': 10
+}
+
+AUTOCOMPLETE_SELECTORS = [
+    "[role='listbox'] [role='option']",
+    "ul[class*='autocomplete'] li",
+    "div[class*='suggestion'] li",
+    "[data-testid*='airport'] li"
+]
+
+
+def page_ready(driver):
+    """document.readyState has reached complete"""
+    return driver.execute_script("return document.readyState") == 'complete'
+
+
+def element_gone(element):
+    """Predicate factory: element was removed or hidden"""
+    def predicate(driver):
+        try:
+            return not element.is_displayed()
+        except WebDriverException:
+            return True
+    return predicate
+
+
+def autocomplete_visible(driver):
+    """An airport suggestion dropdown is showing"""
+    for selector in AUTOCOMPLETE_SELECTORS:
+        for option in driver.find_elements(By.CSS_SELECTOR, selector):
+            if option.is_displayed():
+                return True
+    return False
+
+
+def results_populated(driver):
+    """At least one price is rendered on the page"""
+    return len(driver.execute_script(PRICE_NODES_SCRIPT)) > 0
+
+
+def prices_stable():
+    """Predicate factory: the rendered prices did not change between two polls"""
+    state = {'last': None}
+
+    def predicate(driver):
+        current = driver.execute_script(PRICE_NODES_SCRIPT)
+        stable = bool(current) and current == state['last']
+        state['last'] = current
+        return stable
+    return predicate
+
+
+class WaitEngine:
+    def __init__(self, budgets=None, poll_frequency=0.25, metrics=None):
+        """Create an engine with per-stage timeout budgets in seconds"""
+        self.budgets = dict(DEFAULT_BUDGETS)
+        self.budgets.update(budgets or {})
+        self.poll_frequency = poll_frequency
+        self.metrics = metrics or NullMetrics()
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.timeouts = {}
+
+    def wait(self, driver, stage, predicate, poll_frequency=None):
+        """Wait for predicate within the stage budget; return True if it held"""
+        budget = self.budgets.get(stage, 10)
+        started = time.monotonic()
+        with self.metrics.span(f"wait_{stage}") as span:
+            try:
+                WebDriverWait(driver, budget, poll_frequency=poll_frequency or self.poll_frequency).until(predicate)
+                ok = True
+            except TimeoutException:
+                ok = False
+                span.fail('timeout')
+        self.record(stage, time.monotonic() - started, ok)
+        return ok
+
+    def record(self, stage, elapsed, ok=True):
+        """Store how long a stage took"""
+        with self._lock:
+            self.timings.setdefault(stage, []).append(elapsed)
+            if not ok:
+                self.timeouts[stage] = self.timeouts.get(stage, 0) + 1
+
+    def summary(self):
+        """Return {stage: {count, avg, max, timeouts, budget}}"""
+        with self._lock:
+            result = {}
+            for stage, values in self.timings.items():
+                result[stage] = {
+                    'count': len(values),
+                    'avg': sum(values) / len(values),
+                    'max': max(values),
+                    'timeouts': self.timeouts.get(stage, 0),
+                    'budget': self.budgets.get(stage, 10)
+                }
+            return result
+
+    def reset(self):
+        """Forget recorded timings"""
+        with self._lock:
+            self.timings = {}
+            self.timeouts = {}
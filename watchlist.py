@@ -0,0 +1,160 @@
+"""
+Multi-route watchlist
+Many (route, dates, cabin, passengers, threshold) watches in one process; identical searches are
+fetched once and the result is fanned out to every watch that asked for it
+"""
+
+import json
+import os
+from collections import namedtuple
+from price_store import route_key
+from travel_dates import expand_all, parse_travel_date
+
+CABINS = ('economy', 'premium_economy', 'business', 'first')
+
+
+class Query(namedtuple('Query', 'origin destination date cabin adults children')):
+    """One search: everything that changes the price that comes back"""
+    __slots__ = ()
+
+    @property
+    def route(self):
+        return route_key(self.origin, self.destination, self.cabin, self.adults, self.children)
+
+    def is_default_party(self):
+        """1 adult in economy - the only party the browser form flow enters"""
+        return self.cabin == 'economy' and self.adults == 1 and self.children == 0
+
+
+class WatchEntry:
+    __slots__ = ('name', 'origin', 'destination', 'dates', 'cabin', 'adults', 'children', 'threshold')
+
+    def __init__(self, origin, destination, dates, threshold, cabin='economy', adults=1, children=0, name=None):
+        """
+        A single watch; dates may mix single dates, 'first..last' ranges and flexible windows
+        (see travel_dates.expand_dates), in whatever format the monitor uses
+        """
+        if cabin not in CABINS:
+            raise ValueError(f"Unknown cabin '{cabin}' (expected one of {', '.join(CABINS)})")
+        self.origin = origin.strip().upper()
+        self.destination = destination.strip().upper()
+        self.dates = list(dates)
+        self.cabin = cabin
+        self.adults = int(adults)
+        self.children = int(children)
+        self.threshold = threshold
+        self.name = name or f"{self.origin} → {self.destination}"
+
+    def travel_dates(self, today=None):
+        """The watch's date specs expanded lazily into single travel dates"""
+        return expand_all(self.dates, today)
+
+    def queries(self):
+        for date in self.travel_dates():
+            yield Query(self.origin, self.destination, date, self.cabin, self.adults, self.children)
+
+
+def load_watchlist(config):
+    """
+    Watches from config['watchlist'] (or a JSON list in the WATCHLIST env variable)
+    Without one, the classic origin/destination/dates/price_threshold settings form a single watch
+    """
+    threshold = config.get('price_threshold', float('inf'))
+    raw = config.get('watchlist')
+    if raw is None and os.getenv('WATCHLIST'):
+        raw = json.loads(os.getenv('WATCHLIST'))
+    if not raw:
+        return [WatchEntry(config.get('origin', 'DIY'), config.get('destination', 'IST'),
+                           config.get('dates', []), threshold)]
+
+    entries = []
+    for item in raw:
+        entries.append(WatchEntry(
+            item['origin'], item['destination'],
+            item.get('dates', config.get('dates', [])),
+            item.get('price_threshold', threshold),
+            cabin=item.get('cabin', 'economy'),
+            adults=item.get('adults', 1),
+            children=item.get('children', 0),
+            name=item.get('name')
+        ))
+    return entries
+
+
+class Watchlist:
+    def __init__(self, entries):
+        """Index watches by the searches they need"""
+        self.entries = entries
+        self.subscribers = {}
+        self.subscriptions = 0
+        for entry in entries:
+            for query in entry.queries():
+                self.subscribers.setdefault(query, []).append(entry)
+                self.subscriptions += 1
+
+    def queries(self):
+        """Unique searches, in watchlist order"""
+        return list(self.subscribers)
+
+    def routes(self):
+        """History route keys covered by the watchlist"""
+        return sorted({query.route for query in self.subscribers})
+
+    def shared(self):
+        """Searches saved by deduplication"""
+        return self.subscriptions - len(self.subscribers)
+
+    def describe(self):
+        """One line for startup messages"""
+        if len(self.entries) == 1:
+            entry = self.entries[0]
+            return f"{entry.name} ({len(self.subscribers)} dates, threshold {entry.threshold:g} TL)"
+        return f"{len(self.entries)} watches, {len(self.subscribers)} searches"
+
+    def grid_batches(self, queries, width):
+        """
+        Group searches that differ only by date into runs spanning fewer than `width` days,
+        so one fare-calendar response can cover a whole run
+        """
+        groups = {}
+        batches = []
+        for query in queries:
+            try:
+                parse_travel_date(query.date)
+            except ValueError:
+                batches.append([query])
+                continue
+            groups.setdefault(query._replace(date=''), []).append(query)
+        for group in groups.values():
+            group.sort(key=lambda q: parse_travel_date(q.date))
+            batch = []
+            for query in group:
+                if batch and (parse_travel_date(query.date) - parse_travel_date(batch[0].date)).days >= width:
+                    batches.append(batch)
+                    batch = []
+                batch.append(query)
+            batches.append(batch)
+        return batches
+
+    def fan_out(self, query, prices):
+        """One check_and_notify result per watch subscribed to this search"""
+        results = []
+        if not prices:
+            return results
+        min_price = min(p['price'] for p in prices)
+        for entry in self.subscribers.get(query, []):
+            low_prices = [p for p in prices if p['price'] <= entry.threshold]
+            result = {
+                'date': query.date,
+                'route': query.route,
+                'watch': entry.name,
+                'threshold': entry.threshold,
+                'min_price': min_price,
+                'alert': bool(low_prices)
+            }
+            if low_prices:
+                result['low_prices'] = low_prices
+            else:
+                result['prices'] = prices
+            results.append(result)
+        return results